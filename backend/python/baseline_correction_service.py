@@ -1,33 +1,16 @@
 from flask import Flask, request, jsonify
+import json
 import math
+from scipy.ndimage import minimum_filter1d
 
-app = Flask(__name__)
-
-
-def is_number(s):
-    if s is None:
-        return False
-    if isinstance(s, (int, float)):
-        return True
-    if isinstance(s, str):
-        try:
-            float(s)
-            return True
-        except Exception:
-            return False
-    return False
+from schema_inference import numeric_columns
+from decimation import pyramid_for_table
+from jobs import JobError, JobManager, no_progress, register_job_routes
+from profiling import install_profiler
+from cubes import run_cube
 
-
-def numeric_columns(table):
-    if not table or len(table) == 0:
-        return []
-    first = table[0]
-    # detect numeric columns but exclude common x-axis names (shift/wavenumber/index/time/label)
-    x_candidates = ['x', 'shift', 'wavenumber', 'raman', 'index', 'time', 'label', 'raman_shift', 'wavenumber_cm']
-    numeric_cols = [k for k, v in first.items() if is_number(v)]
-    y_cols = [c for c in numeric_cols if not any(x in c.lower() for x in x_candidates)]
-    # if we didn't find any y-like numeric columns, return all numeric columns as a fallback
-    return y_cols if len(y_cols) > 0 else numeric_cols
+app = Flask(__name__)
+install_profiler(app, 'baseline-correction')
 
 
 def table_to_array(table, cols):
@@ -93,21 +76,33 @@ def rolling_min(arr, window=5):
     return corrected
 
 
-@app.route('/api/baseline-correction', methods=['POST'])
-def baseline_correction():
-    payload = request.get_json() or {}
+# Vectorized equivalents on a (points, columns) array, used for hyperspectral cubes
+def apply_baseline_correction(arr, method, params):
+    if method in ('min_subtract', 'polynomial'):
+        return arr - arr.min(axis=0)
+    if method == 'rolling_min':
+        window = int(params.get('window', 5))
+        if window < 1:
+            window = 5
+        # same centered, edge-padded window as rolling_min
+        return arr - minimum_filter1d(arr, size=window, axis=0, mode='nearest')
+    raise ValueError(f'Unknown method {method}')
+
+
+def run_baseline_correction(payload, progress=no_progress):
     table = payload.get('tableData') or payload.get('data') or []
     params = payload.get('params', {})
     method = params.get('method', 'min_subtract')
 
     if not isinstance(table, list):
-        return jsonify({'error': 'tableData must be a list of rows (objects)'}), 400
+        return {'error': 'tableData must be a list of rows (objects)'}, 400
 
-    cols = numeric_columns(table)
+    cols = numeric_columns(table, payload.get('fileId'))
     if not cols:
-        return jsonify({'error': 'No numeric columns found'}), 400
+        return {'error': 'No numeric columns found'}, 400
 
     arr = table_to_array(table, cols)
+    progress(0.2, 'parsed')
 
     if method == 'min_subtract':
         corrected = min_subtract(arr)
@@ -120,10 +115,50 @@ def baseline_correction():
         # Polynomial fitting without numpy is expensive; fall back to min_subtract for now
         corrected = min_subtract(arr)
     else:
-        return jsonify({'error': f'Unknown method {method}'}), 400
+        return {'error': f'Unknown method {method}'}, 400
 
+    progress(0.8, 'filtered')
     out_table = array_to_table(table, cols, corrected)
-    return jsonify({'tableData': out_table})
+    result = {'tableData': out_table}
+    # a pyramid costs a disk write per call, so interactive (slider) requests only get one when they ask
+    pyramid_id = None
+    if params.get('pyramid'):
+        try:
+            pyramid_id = pyramid_for_table(table, 'baseline-correction:' + json.dumps(params, sort_keys=True), values=corrected, cols=cols, file_id=payload.get('fileId'))
+        except Exception as e:
+            # the pyramid only speeds up later zooming; never fail the request over it
+            app.logger.warning(f'Pyramid build failed: {e}')
+    if pyramid_id:
+        result['pyramidId'] = pyramid_id
+    return result, 200
+
+
+@app.route('/api/baseline-correction', methods=['POST'])
+def baseline_correction():
+    body, status = run_baseline_correction(request.get_json() or {})
+    return jsonify(body), status
+
+
+def baseline_correction_job(payload, job):
+    body, status = run_baseline_correction(payload, job.report)
+    if status != 200:
+        raise JobError(body, status)
+    return body
+
+
+# Asynchronous variant for large inputs: /api/baseline-correction/jobs
+register_job_routes(app, '/api/baseline-correction', JobManager('baseline-correction', baseline_correction_job))
+
+
+def baseline_correction_cube_job(payload, job):
+    body, status = run_cube(payload, apply_baseline_correction, job.report)
+    if status != 200:
+        raise JobError(body, status)
+    return body
+
+
+# Hyperspectral cubes registered through /api/upload (.npy, y x spectral): /api/baseline-correction/cube/jobs
+register_job_routes(app, '/api/baseline-correction/cube', JobManager('baseline-correction-cube', baseline_correction_cube_job, workers=1, max_queue=4))
 
 
 if __name__ == '__main__':
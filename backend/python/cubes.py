@@ -0,0 +1,203 @@
+"""
+Hyperspectral Cubes
+Mapping experiments are stored as memory-mapped .npy cubes shaped
+(y, x, spectral). They never go through the row-dict JSON interface:
+processing reads tiles of consecutive spectra (contiguous in the file),
+applies a service's filter along the spectral axis on a process pool and
+writes into a new memory-mapped cube, so memory stays bounded by
+workers x tile size however large the map is.
+"""
+
+import os
+import json
+import time
+import shutil
+from uuid import uuid4
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import numpy as np
+
+from jobs import no_progress
+from precision import resolve_dtype
+
+UPLOAD_DIR = os.path.join(os.path.dirname(__file__), 'uploads')
+CUBE_DIR = os.path.join(UPLOAD_DIR, 'cubes')
+CUBE_EXT = '.npy'
+
+# Input bytes per tile; each worker holds a few copies of one tile (read, transposed, filtered)
+DEFAULT_TILE_BYTES = 16 * 1024 * 1024
+
+
+def cube_path(cube_id):
+    return os.path.join(CUBE_DIR, f'{cube_id}{CUBE_EXT}')
+
+
+def open_cube(path, mode='r'):
+    """Memory-map a (y, x, spectral) cube; raises ValueError if the file is not one"""
+    try:
+        cube = np.load(path, mmap_mode=mode, allow_pickle=False)
+    except (OSError, ValueError) as e:
+        raise ValueError(f'Not a readable .npy file: {e}')
+    if cube.ndim != 3:
+        raise ValueError(f'Expected a (y, x, spectral) cube, got shape {cube.shape}')
+    if cube.dtype.kind not in 'iuf':
+        raise ValueError(f'Cube dtype {cube.dtype} is not numeric')
+    if not cube.flags.c_contiguous:
+        # tiles are row ranges of cube.reshape(-1, spectral), which would copy a Fortran-order map
+        raise ValueError('Cube must be saved in C order (np.save of a C-contiguous array)')
+    return cube
+
+
+def describe_cube(cube):
+    ny, nx, points = cube.shape
+    return {
+        'shape': [ny, nx, points],
+        'dtype': cube.dtype.name,
+        'spectra': ny * nx,
+        'points': points,
+        'bytes': int(cube.nbytes),
+    }
+
+
+def register_cube(src_path, filename, move=True, extra=None):
+    """
+    Store a cube under CUBE_DIR and write upload metadata next to the other
+    uploads, so it is listed by /api/upload like a table file.
+    """
+    os.makedirs(CUBE_DIR, exist_ok=True)
+    info = describe_cube(open_cube(src_path))
+    cube_id = str(uuid4())
+    dest = cube_path(cube_id)
+    if move:
+        shutil.move(src_path, dest)
+    else:
+        shutil.copyfile(src_path, dest)
+    meta = {
+        'id': cube_id,
+        'filename': filename,
+        'uploadDate': datetime.utcnow().isoformat() + 'Z',
+        'active': False,
+        'type': 'cube',
+        'cube': info,
+        'parsedData': [],
+    }
+    if extra:
+        meta.update(extra)
+    with open(os.path.join(UPLOAD_DIR, f'{cube_id}.json'), 'w', encoding='utf-8') as f:
+        json.dump(meta, f, default=str)
+    return meta
+
+
+def tile_ranges(n_spectra, points, tile_bytes=DEFAULT_TILE_BYTES):
+    """(start, stop) ranges of flattened spectrum indices, about tile_bytes of float64 each"""
+    per_tile = max(1, int(tile_bytes) // max(points * 8, 1))
+    return [(start, min(start + per_tile, n_spectra)) for start in range(0, n_spectra, per_tile)]
+
+
+def _process_tile(src, dst, apply, method, params, start, stop, work_dtype):
+    """Worker: filter spectra [start, stop) of src into dst, both opened as memmaps here"""
+    cube = np.load(src, mmap_mode='r')
+    out = np.load(dst, mmap_mode='r+')
+    points = cube.shape[2]
+    flat_in = cube.reshape(-1, points)
+    flat_out = out.reshape(-1, points)
+    # the services filter along axis 0 of (points, columns)
+    block = np.array(flat_in[start:stop].T, dtype=work_dtype, order='C')
+    result = apply(block, method, params)
+    flat_out[start:stop] = result.T
+    out.flush()
+    del out
+    return stop - start
+
+
+def process_cube(cube_id, apply, method, params, workers=None, tile_bytes=DEFAULT_TILE_BYTES, progress=no_progress):
+    """
+    Apply a service's `apply(arr, method, params)` (module-level, so it can be
+    sent to worker processes) to every spectrum of a registered cube and
+    register the result as a new cube.
+
+    Returns:
+        (metadata of the new cube, timing/memory report)
+    """
+    src = cube_path(cube_id)
+    if not cube_id.replace('-', '').isalnum() or not os.path.exists(src):
+        raise FileNotFoundError(f'Cube {cube_id} not found')
+    cube = open_cube(src)
+    ny, nx, points = cube.shape
+    n_spectra = ny * nx
+    if 'dtype' in params:
+        work_dtype = resolve_dtype(params)
+    else:
+        work_dtype = cube.dtype if cube.dtype.kind == 'f' else np.dtype(np.float64)
+
+    # fail fast on an unknown method or bad params before creating anything
+    apply(np.array(cube.reshape(-1, points)[:1].T, dtype=work_dtype), method, params)
+
+    os.makedirs(CUBE_DIR, exist_ok=True)
+    tmp = os.path.join(CUBE_DIR, f'.{uuid4()}{CUBE_EXT}')
+    out = np.lib.format.open_memmap(tmp, mode='w+', dtype=work_dtype, shape=cube.shape)
+    del out
+
+    tiles = tile_ranges(n_spectra, points, tile_bytes)
+    workers = max(1, min(workers or os.cpu_count() or 1, len(tiles)))
+    start_time = time.perf_counter()
+    done = 0
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # keep at most two tiles per worker in flight so queued arguments stay small
+            pending = set()
+            next_tile = 0
+            while next_tile < len(tiles) or pending:
+                while next_tile < len(tiles) and len(pending) < 2 * workers:
+                    a, b = tiles[next_tile]
+                    pending.add(pool.submit(_process_tile, src, tmp, apply, method, params, a, b, work_dtype))
+                    next_tile += 1
+                finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for fut in finished:
+                    done += fut.result()
+                try:
+                    progress(done / n_spectra, f'{done}/{n_spectra} spectra')
+                except BaseException:
+                    for fut in pending:
+                        fut.cancel()
+                    raise
+    except BaseException:
+        os.remove(tmp)
+        raise
+
+    elapsed = time.perf_counter() - start_time
+    per_tile = tiles[0][1] - tiles[0][0]
+    meta = register_cube(tmp, f'{method}-{cube_id}{CUBE_EXT}', extra={'source': cube_id, 'method': method, 'params': params})
+    report = {
+        'tiles': len(tiles),
+        'spectraPerTile': per_tile,
+        'workers': workers,
+        'elapsedMs': round(elapsed * 1000, 3),
+        'spectraPerSecond': round(n_spectra / elapsed, 1) if elapsed else None,
+        # read copy + transposed block + filter output, per worker
+        'tileMemoryBoundBytes': int(3 * per_tile * points * np.dtype(work_dtype).itemsize * workers),
+    }
+    return meta, report
+
+
+def run_cube(payload, apply, progress=no_progress):
+    """Shared body of the services' cube jobs -> (body, status)"""
+    params = payload.get('params', {})
+    method = params.get('method')
+    cube_id = payload.get('fileId') or payload.get('cubeId')
+    if not cube_id or not method:
+        return {'error': 'fileId and params.method are required'}, 400
+    try:
+        tile_bytes = int(params.get('tileBytes', DEFAULT_TILE_BYTES))
+        workers = int(params['workers']) if params.get('workers') else None
+    except (TypeError, ValueError):
+        return {'error': 'tileBytes and workers must be integers'}, 400
+    filter_params = {k: v for k, v in params.items() if k not in ('tileBytes', 'workers')}
+    try:
+        meta, report = process_cube(cube_id, apply, method, filter_params, workers, tile_bytes, progress)
+    except FileNotFoundError as e:
+        return {'error': str(e)}, 404
+    except ValueError as e:
+        return {'error': str(e)}, 400
+    return {'fileId': meta['id'], 'cube': meta['cube'], 'source': cube_id, 'method': method, 'report': report}, 200
@@ -14,8 +14,13 @@ import numpy as np
 import pandas as pd
 import scipy
 
+from jobs import JobCancelled, JobError, JobManager, register_job_routes
+from spectrum_function import PROCESS_NAME, apply_spectrum_function
+from profiling import install_profiler
+
 app = Flask(__name__)
 CORS(app)
+install_profiler(app, 'custom-code')
 
 # Create a restricted import function that only allows safe modules
 def safe_import(name, *args, **kwargs):
@@ -59,26 +64,34 @@ SAFE_LIBRARIES = {
 }
 
 
-def execute_custom_code(code: str, input_data: list) -> dict:
+def make_restricted_globals():
+    """Fresh globals for user code (module-level so worker processes can rebuild them)"""
+    return {
+        '__builtins__': SAFE_BUILTINS,
+        **SAFE_LIBRARIES,
+    }
+
+def execute_custom_code(code: str, input_data: list, progress=None, params=None) -> dict:
     """
     Execute user-provided Python code in a restricted environment.
     
     Args:
         code: Python code string to execute
         input_data: List of dictionaries (table data)
+        progress: Optional callback exposed to user code as report_progress(fraction, message)
+        params: Keyword arguments for a user-defined process(x, y, **params)
     
     Returns:
         dict with 'success', 'output_data', 'stdout', 'stderr', 'error'
     """
     # Create restricted globals
-    restricted_globals = {
-        '__builtins__': SAFE_BUILTINS,
-        **SAFE_LIBRARIES,
-    }
+    restricted_globals = make_restricted_globals()
     
     # Add input data to execution environment
     restricted_globals['input_data'] = input_data
     restricted_globals['output_data'] = None
+    if progress is not None:
+        restricted_globals['report_progress'] = progress
     
     # Capture stdout and stderr
     stdout_capture = io.StringIO()
@@ -88,6 +101,10 @@ def execute_custom_code(code: str, input_data: list) -> dict:
         # Execute code with restricted globals
         with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
             exec(code, restricted_globals)
+            # Per-spectrum contract: code defines process(x, y, **params) and leaves output_data unset
+            process = restricted_globals.get(PROCESS_NAME)
+            if callable(process) and restricted_globals.get('output_data') is None:
+                restricted_globals['output_data'] = apply_spectrum_function(process, input_data, params, code=code, make_globals=make_restricted_globals)
         
         # Get output data (user should set 'output_data' variable)
         output_data = restricted_globals.get('output_data', input_data)
@@ -100,6 +117,9 @@ def execute_custom_code(code: str, input_data: list) -> dict:
             'error': None
         }
     
+    except JobCancelled:
+        raise
+    
     except Exception as e:
         return {
             'success': False,
@@ -122,7 +142,7 @@ def execute_code():
             return jsonify({'error': 'No code provided'}), 400
         
         # Execute the code
-        result = execute_custom_code(code, input_data)
+        result = execute_custom_code(code, input_data, params=data.get('params') or {})
         
         return jsonify(result), 200
     
@@ -133,6 +153,19 @@ def execute_code():
         }), 500
 
 
+def execute_code_job(payload, job):
+    """Job variant of /execute; user code may call report_progress() and is cancelled there"""
+    code = payload.get('code', '')
+    if not code:
+        raise JobError({'error': 'No code provided'})
+    return execute_custom_code(code, payload.get('input_data', []), progress=job.report, params=payload.get('params') or {})
+
+
+# Long-running executions: submit to /api/custom-code/jobs and poll instead of holding the request.
+# A single worker keeps stdout/stderr capture (process-wide redirects) from interleaving.
+register_job_routes(app, '/api/custom-code', JobManager('custom-code', execute_code_job, workers=1, max_queue=8))
+
+
 @app.route('/api/custom-code/validate', methods=['POST'])
 def validate_code():
     """Validate Python code syntax without executing"""
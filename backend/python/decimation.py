@@ -0,0 +1,280 @@
+"""
+Decimation
+LTTB and min/max-per-bucket downsampling plus a multi-resolution min/max
+pyramid, so a zoom range at a given pixel width is answered in O(pixels).
+"""
+
+import os
+import json
+import shutil
+import hashlib
+from uuid import uuid4
+
+import numpy as np
+
+from schema_inference import infer_schema, dataset_fingerprint, to_float
+
+PYRAMID_DIR = os.path.join(os.path.dirname(__file__), 'uploads', 'pyramids')
+# Datasets shorter than this are sent as-is; a pyramid would not pay for itself
+PYRAMID_MIN_ROWS = 5000
+# Each level merges this many buckets of the level below
+PYRAMID_FACTOR = 4
+# Bucket size (in raw points) of the finest pyramid level
+PYRAMID_BASE = 4
+# Most recently written pyramids kept on disk
+PYRAMID_LIMIT = 64
+
+METHODS = ('minmax', 'lttb')
+
+
+def _bucket_edges(n, n_buckets):
+    return np.linspace(0, n, n_buckets + 1).astype(np.int64)
+
+
+def _finite(x, y):
+    # gaps (null / NaN) can never be a bucket extreme and are not valid JSON; drop them
+    finite = np.isfinite(x) & np.isfinite(y)
+    return (x, y) if finite.all() else (x[finite], y[finite])
+
+
+def minmax_decimate(x, y, n_buckets):
+    """Keep the min and max sample of each bucket (in original order) -> (x, y)"""
+    x, y = _finite(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    n = len(y)
+    if n_buckets <= 0 or n <= 2 * n_buckets:
+        return x, y
+    starts = _bucket_edges(n, n_buckets)[:-1]
+    idx = np.arange(n)
+    # argmin/argmax per bucket via reduceat on the values, then locate the index
+    mins = np.minimum.reduceat(y, starts)
+    maxs = np.maximum.reduceat(y, starts)
+    bucket = np.repeat(np.arange(n_buckets), np.diff(np.append(starts, n)))
+    is_min = y == mins[bucket]
+    is_max = y == maxs[bucket]
+    first_min = np.full(n_buckets, n, dtype=np.int64)
+    first_max = np.full(n_buckets, n, dtype=np.int64)
+    np.minimum.at(first_min, bucket[is_min], idx[is_min])
+    np.minimum.at(first_max, bucket[is_max], idx[is_max])
+    keep = np.unique(np.concatenate([first_min, first_max]))
+    return x[keep], y[keep]
+
+
+def lttb(x, y, n_out):
+    """Largest-Triangle-Three-Buckets downsampling -> (x, y) with n_out points"""
+    x, y = _finite(np.asarray(x, dtype=float), np.asarray(y, dtype=float))
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return x, y
+    edges = _bucket_edges(n - 2, n_out - 2) + 1
+    # bucket averages are the "next point" for every triangle
+    sums_x = np.add.reduceat(x[1:-1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:-1], edges[:-1] - 1)
+    counts = np.diff(edges)
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        lo, hi = edges[i], edges[i + 1]
+        ax, ay = x[a], y[a]
+        area = np.abs((ax - avg_x[i + 1]) * (y[lo:hi] - ay) - (ax - x[lo:hi]) * (avg_y[i + 1] - ay))
+        a = lo + int(np.argmax(area))
+        keep[i + 1] = a
+    return x[keep], y[keep]
+
+
+def decimate(x, y, width, method='minmax'):
+    x = to_float(x)
+    y = to_float(y)
+    if len(x) != len(y):
+        raise ValueError(f'x has {len(x)} values but y has {len(y)}')
+    if method == 'lttb':
+        return lttb(x, y, width)
+    if method == 'minmax':
+        return minmax_decimate(x, y, max(1, width // 2))
+    raise ValueError(f'Unknown method {method}')
+
+
+def _pyramid_path(pyramid_id):
+    safe = ''.join(ch for ch in str(pyramid_id) if ch.isalnum() or ch in '-_')
+    return os.path.join(PYRAMID_DIR, safe)
+
+
+def _prune():
+    try:
+        entries = [os.path.join(PYRAMID_DIR, d) for d in os.listdir(PYRAMID_DIR)]
+    except FileNotFoundError:
+        return
+    # in-progress builds ('.tmp') belong to other requests
+    entries = [e for e in entries if os.path.isdir(e) and not e.endswith('.tmp')]
+    entries.sort(key=os.path.getmtime, reverse=True)
+    for old in entries[PYRAMID_LIMIT:]:
+        shutil.rmtree(old, ignore_errors=True)
+
+
+def build_pyramid(pyramid_id, x, values, columns):
+    """
+    Precompute min/max levels for every column and store them as .npy files.
+
+    Args:
+        pyramid_id: Directory name under PYRAMID_DIR
+        x: 1D x-axis values (sorted here if needed)
+        values: 2D array (rows, columns)
+        columns: Column names matching values' second axis
+    """
+    x = np.asarray(x, dtype=float)
+    values = np.asarray(values)
+    # float32 results (compact mode) are stored as float32; everything else as float64
+    values = values.astype(np.float32 if values.dtype == np.float32 else np.float64, copy=False).reshape(len(x), -1)
+    # rows without a position cannot be placed; gaps in values stay NaN and are skipped per level
+    placed = np.isfinite(x)
+    if not placed.all():
+        x, values = x[placed], values[placed]
+    order = np.argsort(x, kind='stable')
+    if np.any(order != np.arange(len(x))):
+        x, values = x[order], values[order]
+
+    path = _pyramid_path(pyramid_id)
+    # every build gets its own directory; concurrent requests may build the same id
+    tmp = f'{path}.{uuid4().hex}.tmp'
+    os.makedirs(tmp)
+    np.save(os.path.join(tmp, 'x.npy'), x)
+    np.save(os.path.join(tmp, 'y.npy'), values)
+
+    n = len(x)
+    buckets = []
+    idx = np.arange(n)
+    mins, maxs = values, values
+    argmins = argmaxs = np.repeat(idx[:, None], values.shape[1], axis=1)
+    size, step = 1, PYRAMID_BASE
+    while n // (size * step) >= 2:
+        # merge `step` buckets of the previous level (the final partial group is kept)
+        m = len(mins)
+        starts = np.arange(0, m, step)
+        rows = np.arange(m)
+        group = rows // step
+        # fmin/fmax skip NaN, so a gap never shows up as an extreme; all-NaN groups stay NaN
+        new_min = np.fmin.reduceat(mins, starts, axis=0)
+        new_max = np.fmax.reduceat(maxs, starts, axis=0)
+        # pick the index of the first extreme inside each group, per column
+        hit_min = np.where(mins == new_min[group], rows[:, None], m)
+        hit_max = np.where(maxs == new_max[group], rows[:, None], m)
+        src_min = np.minimum.reduceat(hit_min, starts, axis=0)
+        src_max = np.minimum.reduceat(hit_max, starts, axis=0)
+        # all-NaN groups have no hit; point them at their first row
+        src_min = np.where(src_min == m, starts[:, None], src_min)
+        src_max = np.where(src_max == m, starts[:, None], src_max)
+        cols = np.arange(values.shape[1])
+        argmins = argmins[src_min, cols]
+        argmaxs = argmaxs[src_max, cols]
+        mins, maxs = new_min, new_max
+        size *= step
+        step = PYRAMID_FACTOR
+        level = len(buckets)
+        for name, arr in (('min', mins), ('max', maxs), ('argmin', argmins), ('argmax', argmaxs)):
+            np.save(os.path.join(tmp, f'L{level}_{name}.npy'), arr)
+        buckets.append(size)
+
+    with open(os.path.join(tmp, 'meta.json'), 'w', encoding='utf-8') as f:
+        json.dump({'id': pyramid_id, 'rows': n, 'columns': list(columns), 'bucketSizes': buckets}, f)
+    try:
+        os.replace(tmp, path)
+    except OSError:
+        # another build of the same id finished first; its contents are identical
+        shutil.rmtree(tmp, ignore_errors=True)
+    _prune()
+    return {'pyramidId': pyramid_id, 'rows': n, 'levels': len(buckets)}
+
+
+def pyramid_for_table(table, key, values=None, cols=None, file_id=None):
+    """
+    Build a pyramid for a row-dict table (or processed values for `cols`)
+    once it is large enough to need one. Returns the pyramid id or None.
+    """
+    if not table or len(table) < PYRAMID_MIN_ROWS:
+        return None
+    schema = infer_schema(table, file_id)
+    if cols is None:
+        cols = schema['y'] or schema['numeric']
+    if not cols:
+        return None
+    if values is not None:
+        values = np.asarray(values, dtype=np.float32 if getattr(values, 'dtype', None) == np.float32 else float)
+    # the same fileId reaches a service through different upstream steps, so the
+    # id always covers the data itself, not just the file and parameters
+    h = hashlib.blake2b(digest_size=12)
+    h.update(str(key).encode())
+    h.update(str(file_id or '').encode())
+    h.update(dataset_fingerprint(table).encode())
+    if values is not None:
+        h.update(np.ascontiguousarray(values).tobytes())
+    pyramid_id = h.hexdigest()
+    if os.path.exists(os.path.join(_pyramid_path(pyramid_id), 'meta.json')):
+        return pyramid_id
+
+    if schema['x']:
+        x = to_float([row.get(schema['x'][0]) for row in table])
+    else:
+        x = np.arange(len(table), dtype=float)
+    if values is None:
+        values = np.column_stack([to_float([row.get(c) for row in table]) for c in cols])
+    build_pyramid(pyramid_id, x, values, cols)
+    return pyramid_id
+
+
+class Pyramid:
+    """Memory-mapped view over a stored pyramid"""
+
+    def __init__(self, pyramid_id):
+        path = _pyramid_path(pyramid_id)
+        meta_path = os.path.join(path, 'meta.json')
+        if not os.path.exists(meta_path):
+            raise FileNotFoundError(f'Pyramid not found: {pyramid_id}')
+        with open(meta_path, 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.path = path
+        self.columns = meta['columns']
+        self.bucket_sizes = meta['bucketSizes']
+        self.x = np.load(os.path.join(path, 'x.npy'), mmap_mode='r')
+        self.y = np.load(os.path.join(path, 'y.npy'), mmap_mode='r')
+
+    def _level(self, level, name):
+        return np.load(os.path.join(self.path, f'L{level}_{name}.npy'), mmap_mode='r')
+
+    def query(self, column, x_min=None, x_max=None, width=1000, method='minmax'):
+        """Decimated (x, y) for one column inside [x_min, x_max] at `width` pixels"""
+        c = self.columns.index(column) if not isinstance(column, int) else column
+        width = max(1, int(width))
+        i0 = 0 if x_min is None else int(np.searchsorted(self.x, float(x_min), side='left'))
+        i1 = len(self.x) if x_max is None else int(np.searchsorted(self.x, float(x_max), side='right'))
+        n = i1 - i0
+        if n <= 2 * width:
+            return _finite(np.asarray(self.x[i0:i1]), np.asarray(self.y[i0:i1, c]))
+
+        # coarsest level that still leaves at least `width` buckets in range
+        level = None
+        for lv, size in enumerate(self.bucket_sizes):
+            if n // size >= width:
+                level = lv
+        if level is None:
+            return decimate(self.x[i0:i1], self.y[i0:i1, c], width, method)
+
+        size = self.bucket_sizes[level]
+        b0, b1 = i0 // size, -(-i1 // size)
+        mins = np.asarray(self._level(level, 'min')[b0:b1, c])
+        maxs = np.asarray(self._level(level, 'max')[b0:b1, c])
+        amin = np.asarray(self._level(level, 'argmin')[b0:b1, c])
+        amax = np.asarray(self._level(level, 'argmax')[b0:b1, c])
+        # the edge buckets may extend past the range; keep only in-range extremes
+        idx = np.concatenate([amin, amax])
+        vals = np.concatenate([mins, maxs])
+        inside = (idx >= i0) & (idx < i1) & np.isfinite(vals)
+        idx, vals = idx[inside], vals[inside]
+        order = np.argsort(idx, kind='stable')
+        idx, vals = idx[order], vals[order]
+        idx, first = np.unique(idx, return_index=True)
+        vals = vals[first]
+        xs = np.asarray(self.x[idx])
+        return decimate(xs, vals, width, method)
@@ -19,6 +19,12 @@ except ImportError:
     scipy = None
     HAS_SCIPY = False
 
+try:
+    from spectrum_function import PROCESS_NAME, apply_spectrum_function
+except ImportError:
+    PROCESS_NAME = None
+    apply_spectrum_function = None
+
 def safe_import(name, *args, **kwargs):
     """Only allow importing numpy, pandas, and scipy"""
     allowed_modules = ['numpy', 'pandas', 'scipy', 'np', 'pd']
@@ -59,13 +65,17 @@ if pd:
 if scipy:
     SAFE_LIBRARIES['scipy'] = scipy
 
-def execute_custom_code(code, input_data):
-    """Execute user code in restricted environment"""
-    # Create restricted globals
-    restricted_globals = {
+def make_restricted_globals():
+    """Fresh globals for user code (module-level so worker processes can rebuild them)"""
+    return {
         '__builtins__': SAFE_BUILTINS,
         **SAFE_LIBRARIES,
     }
+
+def execute_custom_code(code, input_data, params=None):
+    """Execute user code in restricted environment"""
+    # Create restricted globals
+    restricted_globals = make_restricted_globals()
     
     # Add input data
     restricted_globals['input_data'] = input_data
@@ -78,6 +88,10 @@ def execute_custom_code(code, input_data):
     try:
         with redirect_stdout(stdout_capture), redirect_stderr(stderr_capture):
             exec(code, restricted_globals)
+            # Per-spectrum contract: code defines process(x, y, **params) and leaves output_data unset
+            process = restricted_globals.get(PROCESS_NAME) if apply_spectrum_function else None
+            if callable(process) and restricted_globals.get('output_data') is None:
+                restricted_globals['output_data'] = apply_spectrum_function(process, input_data, params, code=code, make_globals=make_restricted_globals)
         
         output_data = restricted_globals.get('output_data', input_data)
         
@@ -112,7 +126,7 @@ if __name__ == '__main__':
         input_data = data.get('input_data', [])
         
         # Execute code
-        result = execute_custom_code(code, input_data)
+        result = execute_custom_code(code, input_data, data.get('params') or {})
         
         # Write result to stdout with proper encoding
         output = json.dumps(result, ensure_ascii=False)
@@ -2,39 +2,89 @@ from flask import Flask, request, jsonify, send_from_directory
 import os
 import csv
 import json
+import time
 import base64
 from io import BytesIO
 from uuid import uuid4
 from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
 from openpyxl import load_workbook
 
+from decimation import Pyramid, METHODS, decimate, pyramid_for_table
+from profiling import install_profiler
+from cubes import CUBE_DIR, cube_path, open_cube, register_cube
+
 app = Flask(__name__)
+install_profiler(app, 'file-upload')
 
 UPLOAD_DIR = os.path.join(os.path.dirname(__file__), 'uploads')
 os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 METADATA_EXT = '.json'
 
+# Server-side directories cubes may be registered from by path (os.pathsep separated; unset: disabled)
+CUBE_IMPORT_DIRS = [os.path.realpath(d) for d in os.environ.get('CUBE_IMPORT_DIRS', '').split(os.pathsep) if d]
+
 def parse_csv_bytes(buffer: bytes):
     text = buffer.decode('utf-8', errors='replace')
     reader = csv.DictReader(text.splitlines())
     return [dict(r) for r in reader]
 
-def parse_xlsx_bytes(buffer: bytes):
-    wb = load_workbook(filename=BytesIO(buffer), data_only=True)
-    ws = wb.worksheets[0]
-    rows = list(ws.values)
-    if not rows:
-        return []
-    headers = [str(h) if h is not None else f'col_{i}' for i, h in enumerate(rows[0])]
+def read_sheet(ws):
+    """Stream one read-only worksheet straight into row dicts"""
+    start = time.perf_counter()
+    rows = ws.iter_rows(values_only=True)
+    header = next(rows, None)
+    if header is None:
+        return {'name': ws.title, 'headers': [], 'rows': [], 'rowCount': 0, 'elapsedMs': round((time.perf_counter() - start) * 1000, 3)}
+    headers = [str(h) if h is not None else f'col_{i}' for i, h in enumerate(header)]
     out = []
-    for r in rows[1:]:
-        row_obj = {}
-        for i, v in enumerate(r):
-            key = headers[i] if i < len(headers) else f'col_{i}'
-            row_obj[key] = v
-        out.append(row_obj)
-    return out
+    for r in rows:
+        # read-only sheets can report trailing blank rows; skip them
+        if r is None or all(v is None for v in r):
+            continue
+        if len(r) > len(headers):
+            extra = [f'col_{i}' for i in range(len(headers), len(r))]
+            headers.extend(extra)
+            # earlier rows get the new columns as empty cells
+            for row in out:
+                row.update(dict.fromkeys(extra))
+        row = dict(zip(headers, r))
+        if len(r) < len(headers):
+            row.update(dict.fromkeys(headers[len(r):]))
+        out.append(row)
+    return {
+        'name': ws.title,
+        'headers': headers,
+        'rows': out,
+        'rowCount': len(out),
+        'elapsedMs': round((time.perf_counter() - start) * 1000, 3),
+    }
+
+def parse_sheet(buffer: bytes, sheet_name: str):
+    """Open the workbook and read one sheet (process pool worker for parallel parsing)"""
+    wb = load_workbook(filename=BytesIO(buffer), read_only=True, data_only=True)
+    try:
+        return read_sheet(wb[sheet_name])
+    finally:
+        wb.close()
+
+def parse_xlsx_sheets(buffer: bytes, parallel: bool = False):
+    # one read-only open serves every sheet; only parallel workers re-open the archive
+    wb = load_workbook(filename=BytesIO(buffer), read_only=True, data_only=True)
+    try:
+        names = wb.sheetnames
+        if not (parallel and len(names) > 1):
+            return [read_sheet(ws) for ws in wb.worksheets]
+    finally:
+        wb.close()
+    workers = min(len(names), os.cpu_count() or 1)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(parse_sheet, [buffer] * len(names), names))
+
+def parse_xlsx_bytes(buffer: bytes):
+    sheets = parse_xlsx_sheets(buffer)
+    return sheets[0]['rows'] if sheets else []
 
 def save_metadata(obj):
     path = os.path.join(UPLOAD_DIR, f"{obj['id']}{METADATA_EXT}")
@@ -71,13 +121,24 @@ def upload_file():
         return jsonify({'error': 'No file selected'}), 400
 
     fname = f.filename
+    if fname.lower().endswith('.npy'):
+        return upload_cube(f, fname)
     buf = f.read()
     parsed = []
+    sheets = []
+    sheet_data = {}
+    parallel = str(request.form.get('parallel', request.args.get('parallel', ''))).lower() in ('1', 'true', 'yes')
     try:
         if fname.lower().endswith('.csv'):
+            start = time.perf_counter()
             parsed = parse_csv_bytes(buf)
+            sheets = [{'name': fname, 'rowCount': len(parsed), 'elapsedMs': round((time.perf_counter() - start) * 1000, 3)}]
         elif fname.lower().endswith('.xls') or fname.lower().endswith('.xlsx'):
-            parsed = parse_xlsx_bytes(buf)
+            parsed_sheets = parse_xlsx_sheets(buf, parallel=parallel)
+            parsed = parsed_sheets[0]['rows'] if parsed_sheets else []
+            sheets = [{'name': sh['name'], 'rowCount': sh['rowCount'], 'elapsedMs': sh['elapsedMs']} for sh in parsed_sheets]
+            # every sheet after the first is kept alongside parsedData (which stays the first sheet)
+            sheet_data = {sh['name']: sh['rows'] for sh in parsed_sheets[1:]}
         else:
             return jsonify({'error': 'Unsupported file type'}), 400
     except Exception as e:
@@ -92,10 +153,67 @@ def upload_file():
         'active': False,
         'parsedData': parsed,
         'content': content_b64,
+        'sheets': sheets,
     }
+    if sheet_data:
+        meta['sheetData'] = sheet_data
+    try:
+        pyramid_id = pyramid_for_table(parsed, 'upload', file_id=fid)
+    except Exception as e:
+        # the pyramid only speeds up later zooming; never fail the request over it
+        app.logger.warning(f'Pyramid build failed: {e}')
+        pyramid_id = None
+    if pyramid_id:
+        meta['pyramidId'] = pyramid_id
     save_metadata(meta)
 
-    return jsonify({'message': 'File uploaded and parsed', 'fileId': fid, 'parsedData': parsed})
+    return jsonify({'message': 'File uploaded and parsed', 'fileId': fid, 'parsedData': parsed, 'sheets': sheets, 'sheetData': sheet_data, 'pyramidId': pyramid_id})
+
+def upload_cube(f, fname):
+    # hyperspectral cubes are streamed to disk and memory-mapped, never parsed into rows
+    os.makedirs(CUBE_DIR, exist_ok=True)
+    tmp = os.path.join(CUBE_DIR, f'.{uuid4()}.upload')
+    f.save(tmp)
+    try:
+        meta = register_cube(tmp, fname)
+    except ValueError as e:
+        os.remove(tmp)
+        return jsonify({'error': 'Invalid cube file', 'details': str(e)}), 400
+    return jsonify({'message': 'Cube uploaded', 'fileId': meta['id'], 'type': 'cube', 'cube': meta['cube']})
+
+@app.route('/api/cubes/register', methods=['POST'])
+def register_cube_path():
+    # large maps already on the server are registered in place of an upload (copied, not moved)
+    payload = request.get_json() or {}
+    path = os.path.realpath(str(payload.get('path', '')))
+    if not any(path.startswith(d + os.sep) for d in CUBE_IMPORT_DIRS):
+        return jsonify({'error': 'Path is not inside CUBE_IMPORT_DIRS'}), 403
+    if not os.path.isfile(path):
+        return jsonify({'error': 'File not found'}), 404
+    try:
+        meta = register_cube(path, payload.get('filename') or os.path.basename(path), move=False)
+    except ValueError as e:
+        return jsonify({'error': 'Invalid cube file', 'details': str(e)}), 400
+    return jsonify({'message': 'Cube registered', 'fileId': meta['id'], 'type': 'cube', 'cube': meta['cube']})
+
+@app.route('/api/cubes/<id>/spectrum', methods=['GET'])
+def cube_spectrum(id):
+    meta = load_metadata(id)
+    if not meta or meta.get('type') != 'cube':
+        return jsonify({'error': 'Cube not found'}), 404
+    cube = open_cube(cube_path(id))
+    y = request.args.get('y', 0, type=int)
+    x = request.args.get('x', 0, type=int)
+    if not (0 <= y < cube.shape[0] and 0 <= x < cube.shape[1]):
+        return jsonify({'error': f'Pixel ({y}, {x}) outside cube of shape {list(cube.shape[:2])}'}), 400
+    return jsonify({'y': y, 'x': x, 'values': cube[y, x].astype(float).tolist()})
+
+@app.route('/api/cubes/<id>/download', methods=['GET'])
+def cube_download(id):
+    meta = load_metadata(id)
+    if not meta or meta.get('type') != 'cube':
+        return jsonify({'error': 'Cube not found'}), 404
+    return send_from_directory(CUBE_DIR, os.path.basename(cube_path(id)), as_attachment=True, download_name=meta['filename'])
 
 @app.route('/api/upload', methods=['GET'])
 def list_files():
@@ -129,6 +247,45 @@ def activate_file(id):
     meta = load_metadata(id)
     return jsonify({'message': 'Activated', 'file': meta})
 
+@app.route('/api/downsample', methods=['POST'])
+def downsample():
+    payload = request.get_json() or {}
+    method = payload.get('method', 'minmax')
+    width = int(payload.get('width', 1000))
+    if method not in METHODS:
+        return jsonify({'error': f'Unknown method {method}'}), 400
+    if width < 1:
+        return jsonify({'error': 'width must be a positive number of pixels'}), 400
+
+    # Inline arrays are decimated directly; otherwise answer from a stored pyramid
+    if 'y' in payload:
+        y = payload.get('y') or []
+        x = payload.get('x') or list(range(len(y)))
+        try:
+            xs, ys = decimate(x, y, width, method)
+        except (TypeError, ValueError, IndexError) as e:
+            return jsonify({'error': 'Invalid x/y arrays', 'details': str(e)}), 400
+        return jsonify({'x': xs.tolist(), 'y': ys.tolist(), 'method': method})
+
+    pyramid_id = payload.get('pyramidId')
+    if not pyramid_id and payload.get('fileId'):
+        meta = load_metadata(payload['fileId'])
+        if not meta:
+            return jsonify({'error': 'File not found'}), 404
+        pyramid_id = meta.get('pyramidId')
+    if not pyramid_id:
+        return jsonify({'error': 'No pyramid available (dataset too small or not processed); send x/y instead'}), 404
+
+    try:
+        pyramid = Pyramid(pyramid_id)
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    column = payload.get('column') or pyramid.columns[0]
+    if column not in pyramid.columns:
+        return jsonify({'error': f'Unknown column {column}', 'columns': pyramid.columns}), 400
+    xs, ys = pyramid.query(column, payload.get('xMin'), payload.get('xMax'), width, method)
+    return jsonify({'x': xs.tolist(), 'y': ys.tolist(), 'column': column, 'method': method, 'pyramidId': pyramid_id})
+
 if __name__ == '__main__':
     # Allow requests from local dev servers (simple CORS for convenience)
     from flask_cors import CORS
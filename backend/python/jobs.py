@@ -0,0 +1,317 @@
+"""
+Background Jobs
+Bounded worker pool with a priority queue for heavy processing requests.
+Jobs are keyed by an idempotency key (header or request-body hash) and their
+status/results are persisted on disk, so a retried request reattaches to the
+running or finished job instead of starting a new one.
+"""
+
+import os
+import json
+import time
+import queue
+import hashlib
+import itertools
+import threading
+
+from flask import request, jsonify
+
+JOBS_DIR = os.path.join(os.path.dirname(__file__), 'jobs')
+# Finished jobs older than this are removed from disk
+JOB_TTL_SECONDS = 3600
+
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETED = 'completed'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED = (COMPLETED, FAILED, CANCELLED)
+
+
+class QueueFull(Exception):
+    """Raised when the job queue has no room (surfaced as HTTP 429)"""
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job when it has been cancelled"""
+
+
+class JobError(Exception):
+    """Raised by job functions to fail a job with a client-facing error body"""
+
+    def __init__(self, body, status=400):
+        super().__init__(body.get('error', 'Job failed') if isinstance(body, dict) else str(body))
+        self.body = body
+        self.status = status
+
+
+class Job:
+    def __init__(self, job_id, priority=0):
+        self.id = job_id
+        self.priority = priority
+        self.status = QUEUED
+        self.progress = 0.0
+        self.message = ''
+        self.error = None
+        self.error_status = None
+        self.created = time.time()
+        self.started = None
+        self.finished = None
+        self.cancel_requested = False
+
+    def report(self, fraction, message=None):
+        """Progress callback handed to job functions; also the cancellation point"""
+        if self.cancel_requested:
+            raise JobCancelled()
+        self.progress = max(0.0, min(1.0, float(fraction)))
+        if message is not None:
+            self.message = str(message)
+
+    def to_dict(self):
+        return {
+            'jobId': self.id,
+            'status': self.status,
+            'progress': round(self.progress, 4),
+            'message': self.message,
+            'error': self.error,
+            'errorStatus': self.error_status,
+            'priority': self.priority,
+            'created': self.created,
+            'started': self.started,
+            'finished': self.finished,
+        }
+
+    @classmethod
+    def from_dict(cls, d):
+        job = cls(d['jobId'], d.get('priority', 0))
+        job.status = d.get('status', FAILED)
+        job.progress = d.get('progress', 0.0)
+        job.message = d.get('message', '')
+        job.error = d.get('error')
+        job.error_status = d.get('errorStatus')
+        job.created = d.get('created', time.time())
+        job.started = d.get('started')
+        job.finished = d.get('finished')
+        return job
+
+
+def no_progress(fraction, message=None):
+    """Progress callback used when a job function runs synchronously"""
+
+
+class JobManager:
+    """
+    Runs `func(payload, job)` on a fixed number of worker threads.
+
+    Args:
+        name: Service name (subdirectory of JOBS_DIR)
+        func: Callable taking (payload, job) and returning a JSON-serializable result
+        workers: Number of worker threads
+        max_queue: Maximum number of queued (not yet running) jobs
+    """
+
+    def __init__(self, name, func, workers=2, max_queue=16, jobs_dir=JOBS_DIR):
+        self.name = name
+        self.func = func
+        self.max_queue = max_queue
+        self.dir = os.path.join(jobs_dir, name)
+        os.makedirs(self.dir, exist_ok=True)
+        self._queue = queue.PriorityQueue()
+        self._payloads = {}
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._seq = itertools.count()
+        self._queued = 0
+        for i in range(workers):
+            t = threading.Thread(target=self._worker, name=f'{name}-job-{i}', daemon=True)
+            t.start()
+
+    # --- persistence -----------------------------------------------------
+
+    def _status_path(self, job_id):
+        return os.path.join(self.dir, f'{job_id}.json')
+
+    def _result_path(self, job_id):
+        return os.path.join(self.dir, f'{job_id}.result.json')
+
+    def _save(self, job):
+        tmp = self._status_path(job.id) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(job.to_dict(), f)
+        os.replace(tmp, self._status_path(job.id))
+
+    def _load(self, job_id):
+        path = self._status_path(job_id)
+        if not os.path.exists(path):
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                job = Job.from_dict(json.load(f))
+        except (OSError, ValueError, KeyError):
+            return None
+        # a job persisted as queued/running belongs to a previous process and is gone
+        if job.status not in FINISHED:
+            return None
+        return job
+
+    def _prune(self):
+        cutoff = time.time() - JOB_TTL_SECONDS
+        for fn in os.listdir(self.dir):
+            path = os.path.join(self.dir, fn)
+            try:
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+            except OSError:
+                continue
+        with self._lock:
+            for job_id in [j for j, job in self._jobs.items() if job.status in FINISHED and (job.finished or 0) < cutoff]:
+                del self._jobs[job_id]
+
+    # --- public API ------------------------------------------------------
+
+    @staticmethod
+    def key_for(body: bytes, prefix=''):
+        return hashlib.sha256(prefix.encode() + b'\0' + body).hexdigest()[:32]
+
+    def submit(self, job_id, payload, priority=0):
+        """Queue a job, or return the existing one with the same id (higher priority runs first)"""
+        self._prune()
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None and job.status not in (FAILED, CANCELLED):
+                return job, False
+            if job is None:
+                job = self._load(job_id)
+                if job is not None and job.status == COMPLETED and os.path.exists(self._result_path(job_id)):
+                    self._jobs[job_id] = job
+                    return job, False
+            if self._queued >= self.max_queue:
+                raise QueueFull()
+            job = Job(job_id, priority)
+            self._jobs[job_id] = job
+            self._payloads[job_id] = payload
+            self._queued += 1
+            self._queue.put((-priority, next(self._seq), job_id))
+        self._save(job)
+        return job, True
+
+    def get(self, job_id):
+        with self._lock:
+            job = self._jobs.get(job_id)
+        return job if job is not None else self._load(job_id)
+
+    def result(self, job_id):
+        path = self._result_path(job_id)
+        if not os.path.exists(path):
+            return None
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def cancel(self, job_id):
+        job = self.get(job_id)
+        if job is None:
+            return None
+        with self._lock:
+            if job.status == QUEUED:
+                job.status = CANCELLED
+                job.finished = time.time()
+                self._payloads.pop(job_id, None)
+                self._queued -= 1
+            elif job.status == RUNNING:
+                job.cancel_requested = True
+        if job.status in FINISHED:
+            self._save(job)
+        return job
+
+    # --- worker ----------------------------------------------------------
+
+    def _worker(self):
+        while True:
+            _, _, job_id = self._queue.get()
+            with self._lock:
+                job = self._jobs.get(job_id)
+                payload = self._payloads.pop(job_id, None)
+                if job is None or job.status != QUEUED:
+                    continue
+                self._queued -= 1
+                job.status = RUNNING
+                job.started = time.time()
+            self._save(job)
+            try:
+                result = self.func(payload, job)
+                tmp = self._result_path(job_id) + '.tmp'
+                with open(tmp, 'w', encoding='utf-8') as f:
+                    json.dump(result, f, default=str)
+                os.replace(tmp, self._result_path(job_id))
+                job.status = COMPLETED
+                job.progress = 1.0
+            except JobCancelled:
+                job.status = CANCELLED
+            except JobError as e:
+                job.status = FAILED
+                job.error = str(e)
+                job.error_status = e.status
+            except Exception as e:
+                job.status = FAILED
+                job.error = f'{type(e).__name__}: {e}'
+                job.error_status = 500
+            job.finished = time.time()
+            self._save(job)
+
+
+def register_job_routes(app, prefix, manager):
+    """
+    Add submit/status/result/cancel endpoints under `<prefix>/jobs`.
+
+    Clients may send an Idempotency-Key header; otherwise the request body hash
+    is used, so retrying the same request reattaches to the same job.
+    """
+    endpoint = prefix.strip('/').replace('/', '_').replace('-', '_')
+
+    def submit_job():
+        payload = request.get_json(silent=True) or {}
+        job_id = request.headers.get('Idempotency-Key') or manager.key_for(request.get_data(), prefix)
+        job_id = ''.join(ch for ch in job_id if ch.isalnum() or ch in '-_')[:64]
+        try:
+            priority = int(request.args.get('priority', payload.get('priority', 0)))
+        except (TypeError, ValueError):
+            priority = 0
+        try:
+            job, created = manager.submit(job_id, payload, priority)
+        except QueueFull:
+            resp = jsonify({'error': 'Job queue is full, retry later'})
+            resp.headers['Retry-After'] = '5'
+            return resp, 429
+        return jsonify({**job.to_dict(), 'reattached': not created}), 202 if created else 200
+
+    def job_status(job_id):
+        job = manager.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job.to_dict())
+
+    def job_result(job_id):
+        job = manager.get(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        if job.status == FAILED:
+            # the status the synchronous endpoint would have answered with
+            return jsonify(job.to_dict()), job.error_status or 500
+        if job.status != COMPLETED:
+            return jsonify({**job.to_dict(), 'error': job.error or 'Job has not completed'}), 409
+        result = manager.result(job_id)
+        if result is None:
+            return jsonify({'error': 'Job result expired'}), 410
+        return jsonify(result)
+
+    def cancel_job(job_id):
+        job = manager.cancel(job_id)
+        if job is None:
+            return jsonify({'error': 'Job not found'}), 404
+        return jsonify(job.to_dict())
+
+    app.add_url_rule(f'{prefix}/jobs', f'{endpoint}_submit_job', submit_job, methods=['POST'])
+    app.add_url_rule(f'{prefix}/jobs/<job_id>', f'{endpoint}_job_status', job_status, methods=['GET'])
+    app.add_url_rule(f'{prefix}/jobs/<job_id>/result', f'{endpoint}_job_result', job_result, methods=['GET'])
+    app.add_url_rule(f'{prefix}/jobs/<job_id>', f'{endpoint}_cancel_job', cancel_job, methods=['DELETE'])
+    app.add_url_rule(f'{prefix}/jobs/<job_id>/cancel', f'{endpoint}_cancel_job_post', cancel_job, methods=['POST'])
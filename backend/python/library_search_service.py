@@ -0,0 +1,100 @@
+from flask import Flask, request, jsonify
+import time
+
+from schema_inference import infer_schema
+from spectral_library import get_library, METRICS
+from profiling import install_profiler
+
+app = Flask(__name__)
+install_profiler(app, 'library-search')
+
+
+# Pull query spectra out of the request: explicit [{x, y}] pairs, or a table
+# with one x-axis column and one or more intensity columns
+def query_spectra(payload):
+    spectra = payload.get('spectra')
+    if spectra:
+        return [(s.get('x', []), s.get('y', [])) for s in spectra], [s.get('name', f'query_{i}') for i, s in enumerate(spectra)]
+
+    table = payload.get('tableData') or payload.get('data') or []
+    schema = infer_schema(table, payload.get('fileId'))
+    if not schema['x'] or not schema['y']:
+        return [], []
+    x_col = schema['x'][0]
+    x = [row.get(x_col) for row in table]
+    pairs = []
+    for col in schema['y']:
+        pairs.append((x, [row.get(col) for row in table]))
+    return pairs, list(schema['y'])
+
+
+@app.route('/api/library-search', methods=['POST'])
+def library_search():
+    payload = request.get_json() or {}
+    params = payload.get('params', {})
+    metric = params.get('metric', 'cosine')
+    try:
+        top_k = int(params.get('topK', 5))
+    except (TypeError, ValueError):
+        return jsonify({'error': 'topK must be an integer'}), 400
+
+    if metric not in METRICS:
+        return jsonify({'error': f'Unknown metric {metric}'}), 400
+
+    try:
+        spectra, names = query_spectra(payload)
+    except (TypeError, ValueError, AttributeError) as e:
+        return jsonify({'error': 'Invalid query spectra', 'details': str(e)}), 400
+    if not spectra:
+        return jsonify({'error': 'No query spectra found (expected "spectra" or tableData with x and intensity columns)'}), 400
+
+    try:
+        library = get_library()
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 503
+    except ValueError as e:
+        # the export exists but cannot be turned into a library; not the query's fault
+        return jsonify({'error': 'Spectral library unavailable', 'details': str(e)}), 503
+
+    start = time.perf_counter()
+    try:
+        matches = library.search(spectra, metric=metric, top_k=top_k)
+    except (TypeError, ValueError) as e:
+        return jsonify({'error': 'Invalid query spectra', 'details': str(e)}), 400
+    elapsed = time.perf_counter() - start
+
+    return jsonify({
+        'results': [{'query': n, 'matches': m} for n, m in zip(names, matches)],
+        'metric': metric,
+        'librarySize': len(library),
+        'elapsedMs': round(elapsed * 1000, 3),
+    })
+
+
+@app.route('/api/library-search/refresh', methods=['POST'])
+def refresh_library():
+    try:
+        library = get_library(force_rebuild=True)
+    except (FileNotFoundError, ValueError) as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'message': 'Library rebuilt', 'count': len(library), 'points': len(library.grid)})
+
+
+@app.route('/api/library-search/info', methods=['GET'])
+def library_info():
+    try:
+        library = get_library()
+    except FileNotFoundError as e:
+        return jsonify({'error': str(e)}), 404
+    except ValueError as e:
+        return jsonify({'error': 'Spectral library unavailable', 'details': str(e)}), 503
+    return jsonify({
+        'count': len(library),
+        'points': len(library.grid),
+        'grid': [float(library.grid[0]), float(library.grid[-1])],
+        'source': library.source,
+    })
+
+
+if __name__ == '__main__':
+    app.run(host='127.0.0.1', port=6005)
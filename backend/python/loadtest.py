@@ -0,0 +1,291 @@
+"""
+Load Test Harness
+Replays interactive slider traffic against the processing services: each
+virtual user repeatedly "drags" a slider, sending a burst of near-identical
+requests (the parameter moves one step per request) to one endpoint, then
+pauses. Reports throughput, p50/p95/p99 latency and error rate per endpoint
+and saves the run as JSON so server-mode or caching changes can be compared
+under the same load.
+
+    python loadtest.py --start --users 8 --duration 30 --rows 4000 --out before.json
+    python loadtest.py --users 8 --duration 30 --rows 4000 --mix smoothing=3,baseline=2 --out after.json
+    python loadtest.py --compare before.json after.json
+"""
+
+import os
+import sys
+import json
+import math
+import time
+import random
+import socket
+import argparse
+import platform
+import threading
+import subprocess
+import urllib.error
+import urllib.request
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+
+# Service scripts started by --start, by port
+SERVICES = {
+    6000: 'noise_filter_service.py',
+    6001: 'baseline_correction_service.py',
+    6002: 'smoothing_service.py',
+    6003: 'file_upload_service.py',
+    6004: 'custom_code_service.py',
+}
+
+CUSTOM_CODE = 'def process(x, y, factor=1.0):\n    return y * factor\n'
+
+
+def synthetic_table(rows, columns, seed=0):
+    """Raman-like spectra: a few Gaussian peaks on a sloped baseline plus noise"""
+    rng = random.Random(seed)
+    peaks = [[(rng.uniform(500, 3000), rng.uniform(5, 40), rng.uniform(200, 2000)) for _ in range(4)] for _ in range(columns)]
+    table = []
+    for i in range(rows):
+        shift = 400 + i * (3000.0 / max(rows - 1, 1))
+        row = {'Raman Shift': round(shift, 3)}
+        for c in range(columns):
+            value = 100 + 0.05 * shift + rng.gauss(0, 15)
+            for center, width, height in peaks[c]:
+                value += height * math.exp(-((shift - center) / width) ** 2)
+            row[f'Sample {c + 1}'] = round(value, 4)
+        table.append(row)
+    return table
+
+
+# Endpoint name -> (port, path, default weight, body for drag step k)
+def _endpoints(table):
+    xs = [row['Raman Shift'] for row in table]
+    ys = [row['Sample 1'] for row in table]
+
+    # inline downsampling has no x range, so a zoom drag sends the visible slice
+    def zoom(k):
+        trim = int(len(xs) * 0.02 * k)
+        return {'x': xs[trim:len(xs) - trim], 'y': ys[trim:len(ys) - trim], 'width': 800, 'method': 'minmax'}
+
+    return {
+        'noise-filter': (6000, '/api/noise-filter', 2, lambda k: {
+            'tableData': table, 'params': {'method': 'moving_average', 'window': 3 + 2 * k}}),
+        'baseline': (6001, '/api/baseline-correction', 3, lambda k: {
+            'tableData': table, 'params': {'method': 'rolling_min', 'window': 5 + 2 * k}}),
+        'smoothing': (6002, '/api/smoothing', 3, lambda k: {
+            'tableData': table, 'params': {'method': 'savgol', 'window': 5 + 2 * k, 'poly': 2}}),
+        'downsample': (6003, '/api/downsample', 1, zoom),
+        'custom-code': (6004, '/api/custom-code/execute', 1, lambda k: {
+            'code': CUSTOM_CODE, 'input_data': table, 'params': {'factor': 1 + 0.1 * k}}),
+    }
+
+
+class HttpTarget:
+    def __init__(self, host, timeout):
+        self.host = host
+        self.timeout = timeout
+
+    def post(self, port, path, body):
+        """(status, response bytes); status 0 for connection errors and timeouts"""
+        req = urllib.request.Request(f'http://{self.host}:{port}{path}', data=body, headers={'Content-Type': 'application/json'})
+        try:
+            with urllib.request.urlopen(req, timeout=self.timeout) as resp:
+                return resp.status, len(resp.read())
+        except urllib.error.HTTPError as e:
+            return e.code, len(e.read() or b'')
+        except (urllib.error.URLError, OSError):
+            return 0, 0
+
+
+def percentile(sorted_values, q):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return None
+    rank = max(1, math.ceil(q / 100.0 * len(sorted_values)))
+    return sorted_values[min(rank, len(sorted_values)) - 1]
+
+
+def summarize(samples, elapsed):
+    latencies = sorted(s[1] for s in samples)
+    errors = sum(1 for s in samples if not 200 <= s[2] < 300)
+    return {
+        'requests': len(samples),
+        'errors': errors,
+        'errorRate': round(errors / len(samples), 4) if samples else 0.0,
+        'throughputRps': round(len(samples) / elapsed, 3) if elapsed else 0.0,
+        'latencyMs': {
+            'mean': round(sum(latencies) / len(latencies), 3) if latencies else None,
+            'p50': percentile(latencies, 50),
+            'p95': percentile(latencies, 95),
+            'p99': percentile(latencies, 99),
+            'max': latencies[-1] if latencies else None,
+        },
+        'statusCodes': {str(code): sum(1 for s in samples if s[2] == code) for code in sorted({s[2] for s in samples})},
+    }
+
+
+def run_load(target, endpoints, mix, users, duration, burst, interval, pause, seed=0):
+    """
+    Run `users` slider-dragging threads for `duration` seconds.
+
+    Returns:
+        (samples, elapsed) where samples are (endpoint, latency ms, status, response bytes)
+    """
+    names = [n for n in mix if mix[n] > 0]
+    weights = [mix[n] for n in names]
+    # encode each drag step once; every user sends the same bodies, like many clients on one dataset
+    bodies = {n: [json.dumps(endpoints[n][3](k)).encode() for k in range(burst)] for n in names}
+    samples = []
+    lock = threading.Lock()
+    start = time.perf_counter()
+    deadline = start + duration
+
+    def user(index):
+        rng = random.Random(seed + index)
+        local = []
+        while time.perf_counter() < deadline:
+            name = rng.choices(names, weights)[0]
+            port, path = endpoints[name][0], endpoints[name][1]
+            for k in range(burst):
+                t0 = time.perf_counter()
+                status, size = target.post(port, path, bodies[name][k])
+                latency = (time.perf_counter() - t0) * 1000
+                local.append((name, round(latency, 3), status, size))
+                # the slider fires every `interval` ms while held; a slow response delays the next step
+                wait = interval / 1000.0 - (time.perf_counter() - t0)
+                if wait > 0:
+                    time.sleep(wait)
+                if time.perf_counter() >= deadline:
+                    break
+            time.sleep(rng.uniform(0, pause / 1000.0))
+        with lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=user, args=(i,), daemon=True) for i in range(users)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    return samples, time.perf_counter() - start
+
+
+def wait_for_port(host, port, timeout=30.0):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            with socket.create_connection((host, port), timeout=1):
+                return True
+        except OSError:
+            time.sleep(0.2)
+    return False
+
+
+def start_services(ports, host):
+    procs = []
+    for port in ports:
+        procs.append(subprocess.Popen([sys.executable, os.path.join(HERE, SERVICES[port])], cwd=HERE,
+                                      stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL))
+    for port, proc in zip(ports, procs):
+        if not wait_for_port(host, port):
+            stop_services(procs)
+            raise RuntimeError(f'{SERVICES[port]} did not start listening on port {port}')
+    return procs
+
+
+def stop_services(procs):
+    for proc in procs:
+        proc.terminate()
+    for proc in procs:
+        try:
+            proc.wait(timeout=10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+def parse_mix(text, endpoints):
+    """'smoothing=3,baseline=2' -> weights; unlisted endpoints are disabled"""
+    if not text:
+        return {name: spec[2] for name, spec in endpoints.items()}
+    mix = {}
+    for part in text.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip()
+        if name not in endpoints:
+            raise ValueError(f"Unknown endpoint {name} (expected one of {', '.join(endpoints)})")
+        mix[name] = float(weight) if weight else 1.0
+    return mix
+
+
+def compare(before_path, after_path):
+    with open(before_path, 'r', encoding='utf-8') as f:
+        before = json.load(f)
+    with open(after_path, 'r', encoding='utf-8') as f:
+        after = json.load(f)
+    out = {}
+    for name in sorted(set(before['endpoints']) | set(after['endpoints'])):
+        a, b = before['endpoints'].get(name), after['endpoints'].get(name)
+        if not a or not b:
+            continue
+        row = {'throughputRps': [a['throughputRps'], b['throughputRps']], 'errorRate': [a['errorRate'], b['errorRate']]}
+        for q in ('p50', 'p95', 'p99'):
+            row[q] = [a['latencyMs'][q], b['latencyMs'][q]]
+        out[name] = row
+    return out
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay concurrent slider traffic against the processing services')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--start', action='store_true', help='start the services needed by the mix and stop them afterwards')
+    parser.add_argument('--users', type=int, default=8, help='concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=30.0, help='seconds of load')
+    parser.add_argument('--rows', type=int, default=2000, help='rows in the synthetic table')
+    parser.add_argument('--columns', type=int, default=3, help='intensity columns in the synthetic table')
+    parser.add_argument('--burst', type=int, default=10, help='requests per slider drag')
+    parser.add_argument('--interval', type=float, default=50.0, help='ms between requests within a drag')
+    parser.add_argument('--pause', type=float, default=1000.0, help='max ms of think time between drags')
+    parser.add_argument('--mix', default=None, help='endpoint weights, e.g. smoothing=3,baseline=2 (default: all endpoints)')
+    parser.add_argument('--timeout', type=float, default=60.0, help='per-request timeout in seconds')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--label', default=None, help='free-form label stored with the results')
+    parser.add_argument('--out', default=None, help='write results JSON here')
+    parser.add_argument('--compare', nargs=2, metavar=('BEFORE', 'AFTER'), help='compare two saved result files and exit')
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print(json.dumps(compare(*args.compare), indent=2))
+        return 0
+
+    table = synthetic_table(args.rows, args.columns, args.seed)
+    endpoints = _endpoints(table)
+    try:
+        mix = parse_mix(args.mix, endpoints)
+    except ValueError as e:
+        parser.error(str(e))
+
+    procs = start_services(sorted({endpoints[n][0] for n in mix if mix[n] > 0}), args.host) if args.start else []
+    try:
+        samples, elapsed = run_load(HttpTarget(args.host, args.timeout), endpoints, mix, args.users, args.duration,
+                                    args.burst, args.interval, args.pause, args.seed)
+    finally:
+        stop_services(procs)
+
+    report = {
+        'label': args.label,
+        'timestamp': time.time(),
+        'host': platform.node(),
+        'config': {k: v for k, v in vars(args).items() if k not in ('compare', 'out')},
+        'mix': mix,
+        'elapsedSeconds': round(elapsed, 3),
+        'overall': summarize(samples, elapsed),
+        'endpoints': {name: summarize([s for s in samples if s[0] == name], elapsed) for name in mix if mix[name] > 0},
+    }
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            json.dump(report, f, indent=2)
+    print(json.dumps({'overall': report['overall'], 'endpoints': report['endpoints']}, indent=2))
+    return 0 if report['overall']['errors'] == 0 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
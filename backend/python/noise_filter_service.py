@@ -1,26 +1,19 @@
 from flask import Flask, request, jsonify
+import json
 import numpy as np
 from scipy.ndimage import gaussian_filter1d
 
-app = Flask(__name__)
+from schema_inference import numeric_columns, table_to_array
+from decimation import pyramid_for_table
+from jobs import JobError, JobManager, no_progress, register_job_routes
+from auto_params import auto_smooth, describe
+from precision import deviation_columns, encode_buffer, max_abs_deviation, resolve_dtype, wants_deviation
+from streaming_filters import lowpass_batch
+from profiling import install_profiler
+from cubes import run_cube
 
-# Helper to identify numeric columns
-def numeric_columns(table):
-    if not table or len(table) == 0:
-        return []
-    first = table[0]
-    return [k for k, v in first.items() if isinstance(v, (int, float)) or (isinstance(v, str) and v.replace('.', '', 1).replace('-', '', 1).isdigit())]
-
-# Convert table rows (list of dicts) to numpy array for given cols
-def table_to_array(table, cols):
-    arr = np.zeros((len(table), len(cols)), dtype=float)
-    for i, row in enumerate(table):
-        for j, col in enumerate(cols):
-            try:
-                arr[i, j] = float(row.get(col, 0) if row.get(col, None) is not None else 0)
-            except Exception:
-                arr[i, j] = 0.0
-    return arr
+app = Flask(__name__)
+install_profiler(app, 'noise-filter')
 
 # Write array back to rows (preserving non-numeric columns)
 def array_to_table(original_table, cols, arr):
@@ -33,32 +26,18 @@ def array_to_table(original_table, cols, arr):
             if isinstance(row.get(col, None), int):
                 new_row[col] = int(round(val))
             else:
-                new_row[col] = float(round(val, 6))
+                new_row[col] = round(float(val), 6)
         out.append(new_row)
     return out
 
-@app.route('/api/noise-filter', methods=['POST'])
-def noise_filter():
-    payload = request.get_json() or {}
-    table = payload.get('tableData') or payload.get('data') or []
-    params = payload.get('params', {})
-    method = params.get('method', 'moving_average')
-
-    if not isinstance(table, list):
-        return jsonify({'error': 'tableData must be a list of rows (objects)'}), 400
-
-    cols = numeric_columns(table)
-    if not cols:
-        return jsonify({'error': 'No numeric columns found'}), 400
-
-    arr = table_to_array(table, cols)
-
+# Apply a noise filter column-wise; the result keeps arr's dtype (float32 or float64)
+def apply_noise_filter(arr, method, params, progress=no_progress, info=None):
     if method == 'moving_average':
         window = int(params.get('window', 3))
         if window < 1:
             window = 3
         # Simple moving average along axis 0 for each column
-        kernel = np.ones(window) / float(window)
+        kernel = np.ones(window, dtype=arr.dtype) / window
         padded = np.pad(arr, ((window//2, window//2), (0,0)), mode='edge')
         smoothed = np.empty_like(arr)
         for c in range(arr.shape[1]):
@@ -66,11 +45,91 @@ def noise_filter():
     elif method == 'gaussian':
         sigma = float(params.get('sigma', 1.0))
         smoothed = gaussian_filter1d(arr, sigma=sigma, axis=0, mode='nearest')
+    elif method == 'lowpass':
+        # causal Butterworth; same filter the streaming sessions run chunk by chunk
+        smoothed = lowpass_batch(arr, float(params.get('cutoff', 0.1)), int(params.get('order', 2))).astype(arr.dtype, copy=False)
+    elif method == 'auto':
+        # per-column window/sigma chosen by closed-form leave-one-out error
+        smoothed, report = auto_smooth(arr, params.get('family', 'gaussian'), params, progress)
+        if info is not None:
+            info['auto'] = report
     else:
-        return jsonify({'error': f'Unknown method {method}'}), 400
+        raise ValueError(f'Unknown method {method}')
+    return smoothed
+
+def run_noise_filter(payload, progress=no_progress):
+    table = payload.get('tableData') or payload.get('data') or []
+    params = payload.get('params', {})
+    method = params.get('method', 'moving_average')
+
+    if not isinstance(table, list):
+        return {'error': 'tableData must be a list of rows (objects)'}, 400
+
+    try:
+        dtype = resolve_dtype(params)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    cols = numeric_columns(table, payload.get('fileId'))
+    if not cols:
+        return {'error': 'No numeric columns found'}, 400
+
+    arr = table_to_array(table, cols, dtype)
+    progress(0.2, 'parsed')
+
+    info = {}
+    try:
+        smoothed = apply_noise_filter(arr, method, params, progress, info)
+    except ValueError as e:
+        return {'error': str(e)}, 400
+
+    progress(0.8, 'filtered')
+    if params.get('output') == 'buffer':
+        result = encode_buffer(smoothed, cols)
+    else:
+        result = {'tableData': array_to_table(table, cols, smoothed)}
+    if 'auto' in info:
+        result['autoParams'] = describe(info['auto'], cols)
+    if wants_deviation(params, dtype):
+        # columns are filtered independently, so a few of them bound the float64 re-run
+        checked = deviation_columns(len(cols))
+        reference = apply_noise_filter(table_to_array(table, [cols[j] for j in checked]), method, params)
+        result['precision'] = {'dtype': dtype.name, 'maxAbsDeviation': max_abs_deviation(smoothed[:, checked], reference),
+                               'columnsChecked': len(checked)}
+    # a pyramid costs a disk write per call, so interactive (slider) requests only get one when they ask
+    pyramid_id = None
+    if params.get('pyramid'):
+        try:
+            pyramid_id = pyramid_for_table(table, 'noise-filter:' + json.dumps(params, sort_keys=True), values=smoothed, cols=cols, file_id=payload.get('fileId'))
+        except Exception as e:
+            # the pyramid only speeds up later zooming; never fail the request over it
+            app.logger.warning(f'Pyramid build failed: {e}')
+    if pyramid_id:
+        result['pyramidId'] = pyramid_id
+    return result, 200
+
+@app.route('/api/noise-filter', methods=['POST'])
+def noise_filter():
+    body, status = run_noise_filter(request.get_json() or {})
+    return jsonify(body), status
+
+def noise_filter_job(payload, job):
+    body, status = run_noise_filter(payload, job.report)
+    if status != 200:
+        raise JobError(body, status)
+    return body
+
+# Asynchronous variant for large inputs: /api/noise-filter/jobs
+register_job_routes(app, '/api/noise-filter', JobManager('noise-filter', noise_filter_job))
+
+def noise_filter_cube_job(payload, job):
+    body, status = run_cube(payload, apply_noise_filter, job.report)
+    if status != 200:
+        raise JobError(body, status)
+    return body
 
-    out_table = array_to_table(table, cols, smoothed)
-    return jsonify({'tableData': out_table})
+# Hyperspectral cubes registered through /api/upload (.npy, y x spectral): /api/noise-filter/cube/jobs
+register_job_routes(app, '/api/noise-filter/cube', JobManager('noise-filter-cube', noise_filter_cube_job, workers=1, max_queue=4))
 
 if __name__ == '__main__':
     app.run(host='127.0.0.1', port=6000)
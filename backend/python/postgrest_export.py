@@ -0,0 +1,360 @@
+"""
+PostgREST Export
+Writes processed rows back to a PostgREST table (raman_data on Supabase)
+without the request-size limits of one giant POST:
+
+- rows are split into chunks by a byte budget (and a row cap)
+- each chunk body is gzip-compressed
+- chunks are sent concurrently over pooled keep-alive connections
+- failed chunks are retried with exponential backoff and jitter
+- finished chunks are recorded in a checkpoint file, so a rerun after a
+  partial failure only sends what is missing
+
+Retries are only safe when a repeated chunk cannot create duplicates. With
+`on_conflict` set, chunks are sent as upserts (Prefer: resolution=merge-duplicates)
+and every failure is retried. Without it, only failures where the server
+cannot have stored the chunk (connection refused, 408/429/500/503) are
+retried; ambiguous ones (timeouts, 502/504) fail the chunk and are left to
+the checkpoint.
+
+    python postgrest_export.py results.json --table raman_data --on-conflict "Sample name,Raman Shift" --checkpoint export.ckpt
+    python postgrest_stub.py --port 54321 --fail-rate 0.2     # local stand-in for testing
+"""
+
+import os
+import sys
+import ssl
+import gzip
+import json
+import time
+import random
+import socket
+import hashlib
+import argparse
+import threading
+import http.client
+from urllib.parse import quote, urlsplit
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_TABLE = 'raman_data'
+# Uncompressed JSON bytes per chunk; keeps requests well under typical gateway limits
+DEFAULT_MAX_BYTES = 1024 * 1024
+DEFAULT_MAX_ROWS = 5000
+
+# The server cannot have stored the chunk: safe to retry even without an upsert key
+RETRY_NOT_APPLIED = (408, 429, 500, 503)
+# The chunk may or may not have been stored: retry only when idempotent
+RETRY_AMBIGUOUS = (502, 504)
+# Every other chunk would fail the same way: stop sending
+FATAL = (401, 403, 404, 413)
+
+
+class ExportError(Exception):
+    """Raised for configuration errors (missing URL, unreadable input)"""
+
+
+class ChunkFailed(Exception):
+    def __init__(self, message, retryable=False, ambiguous=False, fatal=False, retry_after=None):
+        super().__init__(message)
+        self.retryable = retryable
+        self.fatal = fatal
+        self.ambiguous = ambiguous
+        self.retry_after = retry_after
+
+
+def supabase_config(url=None, api_key=None):
+    """Base URL and key, falling back to the same environment variables as routes/supabase.js"""
+    url = url or os.environ.get('SUPABASE_URL')
+    key = api_key or os.environ.get('SUPABASE_SERVICE_KEY') or os.environ.get('SUPABASE_KEY') or os.environ.get('SUPABASE_ANON_KEY')
+    if not url:
+        raise ExportError('SUPABASE_URL is not configured')
+    return url.rstrip('/'), key
+
+
+def chunk_rows(rows, max_bytes=DEFAULT_MAX_BYTES, max_rows=DEFAULT_MAX_ROWS):
+    """
+    Split rows into JSON array bodies of at most max_bytes / max_rows each.
+    A single row larger than the budget becomes its own chunk.
+
+    Returns:
+        (chunks, digest) where chunks are (first row, row count, body bytes)
+        and digest identifies the exact rows and chunking for checkpoints
+    """
+    chunks = []
+    digest = hashlib.sha256()
+    parts, size, first = [], 2, 0
+    for i, row in enumerate(rows):
+        encoded = json.dumps(row, separators=(',', ':'), ensure_ascii=False).encode('utf-8')
+        digest.update(encoded)
+        digest.update(b'\n')
+        if parts and (size + len(encoded) + 1 > max_bytes or len(parts) >= max_rows):
+            chunks.append((first, len(parts), b'[' + b','.join(parts) + b']'))
+            parts, size, first = [], 2, i
+        parts.append(encoded)
+        size += len(encoded) + 1
+    if parts:
+        chunks.append((first, len(parts), b'[' + b','.join(parts) + b']'))
+    digest.update(f'{max_bytes}:{max_rows}'.encode())
+    return chunks, digest.hexdigest()
+
+
+def column_union(rows):
+    """All keys in first-seen order (PostgREST bulk inserts need one key set)"""
+    seen = {}
+    for row in rows:
+        for key in row:
+            seen.setdefault(key, None)
+    return list(seen)
+
+
+class Checkpoint:
+    """Chunk indices already stored, keyed by the export fingerprint"""
+
+    def __init__(self, path, fingerprint):
+        self.path = path
+        self.fingerprint = fingerprint
+        self.done = set()
+        self._lock = threading.Lock()
+        if path and os.path.exists(path):
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+            except (OSError, ValueError):
+                state = {}
+            # a checkpoint for different rows or chunking would skip the wrong chunks
+            if state.get('fingerprint') == fingerprint:
+                self.done = set(state.get('done', []))
+
+    def mark(self, index):
+        with self._lock:
+            self.done.add(index)
+            if not self.path:
+                return
+            tmp = self.path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8') as f:
+                json.dump({'fingerprint': self.fingerprint, 'done': sorted(self.done), 'updated': time.time()}, f)
+            os.replace(tmp, self.path)
+
+
+class ConnectionPool:
+    """One keep-alive connection per worker thread"""
+
+    def __init__(self, base_url, timeout=60.0):
+        parts = urlsplit(base_url)
+        self.scheme = parts.scheme or 'http'
+        self.host = parts.hostname
+        self.port = parts.port
+        self.prefix = parts.path.rstrip('/')
+        self.timeout = timeout
+        self._local = threading.local()
+        self._all = []
+        self._lock = threading.Lock()
+
+    def _connection(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            if self.scheme == 'https':
+                conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout, context=ssl.create_default_context())
+            else:
+                conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+            self._local.conn = conn
+            with self._lock:
+                self._all.append(conn)
+        return conn
+
+    def _discard(self):
+        conn = getattr(self._local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+            with self._lock:
+                if conn in self._all:
+                    self._all.remove(conn)
+
+    def post(self, path, body, headers):
+        """(status, headers, body); raises ChunkFailed on connection errors"""
+        conn = self._connection()
+        reused = conn.sock is not None
+        if not reused:
+            try:
+                conn.connect()
+            except OSError as e:
+                self._discard()
+                raise ChunkFailed(f'connect failed: {e}', retryable=True)
+        try:
+            conn.request('POST', self.prefix + path, body=body, headers=headers)
+            resp = conn.getresponse()
+            data = resp.read()
+        except (http.client.RemoteDisconnected, BrokenPipeError, ConnectionResetError) as e:
+            self._discard()
+            # an idle keep-alive socket closed by the server fails before the request is read
+            raise ChunkFailed(f'connection closed: {e}', retryable=reused, ambiguous=not reused)
+        except (socket.timeout, OSError, http.client.HTTPException) as e:
+            self._discard()
+            raise ChunkFailed(f'request failed: {e}', ambiguous=True)
+        if resp.getheader('Connection', '').lower() == 'close':
+            self._discard()
+        return resp.status, resp, data
+
+    def close(self):
+        with self._lock:
+            for conn in self._all:
+                conn.close()
+            self._all = []
+
+
+def _retry_after(resp):
+    try:
+        return float(resp.getheader('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def export_rows(rows, table=DEFAULT_TABLE, url=None, api_key=None, on_conflict=None, checkpoint=None,
+                max_bytes=DEFAULT_MAX_BYTES, max_rows=DEFAULT_MAX_ROWS, workers=4, compress=True,
+                max_retries=5, backoff=0.5, max_backoff=30.0, timeout=60.0, progress=None):
+    """
+    Insert (or upsert, with on_conflict) rows into a PostgREST table in chunks.
+
+    Args:
+        rows: List of row dicts
+        on_conflict: Comma-separated unique columns; makes every retry an idempotent upsert
+        checkpoint: Path of a checkpoint file; chunks recorded there are skipped on rerun
+        progress: Optional callable(fraction, message)
+
+    Returns:
+        dict summary; 'failed' lists chunks that still need sending
+    """
+    base_url, key = supabase_config(url, api_key)
+    chunks, digest = chunk_rows(rows, max_bytes, max_rows)
+    fingerprint = hashlib.sha256(f'{table}|{on_conflict}|{digest}'.encode()).hexdigest()
+    ckpt = Checkpoint(checkpoint, fingerprint)
+
+    query = '?columns=' + quote(','.join(f'"{c}"' for c in column_union(rows)), safe=',"')
+    prefer = 'return=minimal'
+    if on_conflict:
+        query += '&on_conflict=' + quote(on_conflict, safe=',')
+        prefer += ',resolution=merge-duplicates'
+    path = f'/rest/v1/{quote(table)}{query}'
+    headers = {'Content-Type': 'application/json', 'Prefer': prefer}
+    if key:
+        headers['apikey'] = key
+        headers['Authorization'] = f'Bearer {key}'
+    if compress:
+        headers['Content-Encoding'] = 'gzip'
+
+    pool = ConnectionPool(base_url, timeout)
+    abort = threading.Event()
+    lock = threading.Lock()
+    stats = {'sent': 0, 'retries': 0, 'bytes': 0, 'compressedBytes': 0}
+    failed = []
+    pending = [i for i in range(len(chunks)) if i not in ckpt.done]
+    skipped = len(chunks) - len(pending)
+
+    def send(index):
+        first, count, body = chunks[index]
+        if abort.is_set():
+            with lock:
+                failed.append({'chunk': index, 'firstRow': first, 'rows': count, 'error': 'not sent (export aborted)'})
+            return
+        payload = gzip.compress(body, compresslevel=6) if compress else body
+        attempt = 0
+        while True:
+            try:
+                status, resp, data = pool.post(path, payload, headers)
+                if 200 <= status < 300:
+                    break
+                message = f'HTTP {status}: {data[:300].decode("utf-8", "replace")}'
+                raise ChunkFailed(message, retryable=status in RETRY_NOT_APPLIED,
+                                  ambiguous=status in RETRY_AMBIGUOUS, fatal=status in FATAL,
+                                  retry_after=_retry_after(resp))
+            except ChunkFailed as e:
+                can_retry = e.retryable or (e.ambiguous and on_conflict)
+                if not can_retry or attempt >= max_retries or abort.is_set():
+                    if e.fatal:
+                        abort.set()
+                    with lock:
+                        failed.append({'chunk': index, 'firstRow': first, 'rows': count, 'error': str(e),
+                                       'ambiguous': e.ambiguous, 'attempts': attempt + 1})
+                    return
+                delay = e.retry_after if e.retry_after is not None else random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+                attempt += 1
+                with lock:
+                    stats['retries'] += 1
+                time.sleep(delay)
+        ckpt.mark(index)
+        with lock:
+            stats['sent'] += 1
+            stats['bytes'] += len(body)
+            stats['compressedBytes'] += len(payload)
+            done = stats['sent']
+        if progress is not None:
+            progress(done / max(len(pending), 1), f'{done}/{len(pending)} chunks')
+
+    start = time.perf_counter()
+    try:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as executor:
+            list(executor.map(send, pending))
+    finally:
+        pool.close()
+
+    failed.sort(key=lambda f: f['chunk'])
+    return {
+        'table': table,
+        'rows': len(rows),
+        'chunks': len(chunks),
+        'skipped': skipped,
+        'sent': stats['sent'],
+        'failed': failed,
+        'complete': not failed,
+        'retries': stats['retries'],
+        'bytes': stats['bytes'],
+        'compressedBytes': stats['compressedBytes'],
+        'elapsedMs': round((time.perf_counter() - start) * 1000, 3),
+        'checkpoint': checkpoint,
+    }
+
+
+def load_rows(path):
+    """Row array from a JSON file (bare array, {'data': [...]} or {'tableData': [...]})"""
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        raise ExportError(f'Could not read {path}: {e}')
+    if isinstance(data, dict):
+        data = data.get('data') or data.get('tableData') or []
+    if not isinstance(data, list):
+        raise ExportError(f'{path} does not contain a row array')
+    return data
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export rows to a PostgREST table in compressed, resumable chunks')
+    parser.add_argument('input', help='JSON file with the rows to export')
+    parser.add_argument('--table', default=DEFAULT_TABLE)
+    parser.add_argument('--url', default=None, help='PostgREST/Supabase base URL (default: $SUPABASE_URL)')
+    parser.add_argument('--key', default=None, help='API key (default: $SUPABASE_SERVICE_KEY)')
+    parser.add_argument('--on-conflict', default=None, help='unique columns for idempotent upserts')
+    parser.add_argument('--checkpoint', default=None, help='checkpoint file for resuming')
+    parser.add_argument('--max-bytes', type=int, default=DEFAULT_MAX_BYTES)
+    parser.add_argument('--max-rows', type=int, default=DEFAULT_MAX_ROWS)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--retries', type=int, default=5)
+    parser.add_argument('--no-gzip', action='store_true', help='send uncompressed bodies')
+    args = parser.parse_args(argv)
+
+    try:
+        rows = load_rows(args.input)
+        result = export_rows(rows, args.table, args.url, args.key, args.on_conflict, args.checkpoint,
+                             args.max_bytes, args.max_rows, args.workers, not args.no_gzip, args.retries,
+                             progress=lambda f, m: print(m, file=sys.stderr))
+    except ExportError as e:
+        print(json.dumps({'error': str(e)}))
+        return 2
+    print(json.dumps(result, indent=2))
+    return 0 if result['complete'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
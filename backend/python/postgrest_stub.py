@@ -0,0 +1,124 @@
+"""
+PostgREST Stub
+In-memory stand-in for the Supabase REST endpoint, for exercising
+postgrest_export.py locally. Accepts gzip request bodies, honours
+on_conflict upserts and can inject failures:
+
+    --fail-rate     503 before storing anything (safe to retry)
+    --lost-rate     store the chunk, then answer 504 (ambiguous)
+    --max-body      413 for larger (decompressed) bodies
+
+    python postgrest_stub.py --port 54321 --fail-rate 0.2 --lost-rate 0.05
+    GET  /rest/v1/<table>       stored rows
+    GET  /stub/stats            requests, failures and row counts per table
+    POST /stub/reset            clear everything
+"""
+
+import gzip
+import json
+import random
+import argparse
+import threading
+
+from flask import Flask, request, jsonify
+
+app = Flask(__name__)
+
+config = {'fail_rate': 0.0, 'lost_rate': 0.0, 'max_body': 0, 'seed': None}
+_tables = {}
+_stats = {'requests': 0, 'failed': 0, 'lost': 0, 'rejected': 0}
+_lock = threading.Lock()
+_rng = random.Random()
+
+
+def _conflict_key(row, columns):
+    return tuple(json.dumps(row.get(c), sort_keys=True) for c in columns)
+
+
+@app.route('/rest/v1/<table>', methods=['POST'])
+def insert_rows(table):
+    with _lock:
+        _stats['requests'] += 1
+        roll = _rng.random()
+    body = request.get_data()
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        try:
+            body = gzip.decompress(body)
+        except OSError:
+            return jsonify({'message': 'Invalid gzip body'}), 400
+    if config['max_body'] and len(body) > config['max_body']:
+        with _lock:
+            _stats['rejected'] += 1
+        return jsonify({'message': 'Payload too large'}), 413
+    if roll < config['fail_rate']:
+        with _lock:
+            _stats['failed'] += 1
+        resp = jsonify({'message': 'Service unavailable (injected)'})
+        resp.headers['Retry-After'] = '0'
+        return resp, 503
+    try:
+        rows = json.loads(body)
+    except ValueError:
+        return jsonify({'message': 'Invalid JSON'}), 400
+    if isinstance(rows, dict):
+        rows = [rows]
+
+    on_conflict = [c.strip().strip('"') for c in request.args.get('on_conflict', '').split(',') if c.strip()]
+    merge = 'resolution=merge-duplicates' in request.headers.get('Prefer', '')
+    with _lock:
+        stored = _tables.setdefault(table, {'rows': [], 'index': {}})
+        for row in rows:
+            if on_conflict and merge:
+                key = _conflict_key(row, on_conflict)
+                if key in stored['index']:
+                    stored['rows'][stored['index'][key]] = row
+                    continue
+                stored['index'][key] = len(stored['rows'])
+            stored['rows'].append(row)
+        if roll < config['fail_rate'] + config['lost_rate']:
+            _stats['lost'] += 1
+            return jsonify({'message': 'Gateway timeout (injected, rows were stored)'}), 504
+    return '', 201
+
+
+@app.route('/rest/v1/<table>', methods=['GET'])
+def fetch_rows(table):
+    with _lock:
+        rows = list(_tables.get(table, {'rows': []})['rows'])
+    limit = request.args.get('limit', type=int)
+    return jsonify(rows[:limit] if limit else rows)
+
+
+@app.route('/stub/stats', methods=['GET'])
+def stats():
+    with _lock:
+        return jsonify({**_stats, 'tables': {name: len(t['rows']) for name, t in _tables.items()}, 'config': config})
+
+
+@app.route('/stub/reset', methods=['POST'])
+def reset():
+    with _lock:
+        _tables.clear()
+        for key in _stats:
+            _stats[key] = 0
+    return jsonify({'ok': True})
+
+
+def configure(fail_rate=0.0, lost_rate=0.0, max_body=0, seed=None):
+    config.update({'fail_rate': fail_rate, 'lost_rate': lost_rate, 'max_body': max_body, 'seed': seed})
+    _rng.seed(seed)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='In-memory PostgREST stub for export testing')
+    parser.add_argument('--port', type=int, default=54321)
+    parser.add_argument('--fail-rate', type=float, default=0.0)
+    parser.add_argument('--lost-rate', type=float, default=0.0)
+    parser.add_argument('--max-body', type=int, default=0, help='reject bodies larger than this many bytes (0: no limit)')
+    parser.add_argument('--seed', type=int, default=None)
+    args = parser.parse_args()
+    configure(args.fail_rate, args.lost_rate, args.max_body, args.seed)
+    # keep-alive, like the real gateway, so the exporter's connection reuse is exercised
+    from werkzeug.serving import WSGIRequestHandler
+    WSGIRequestHandler.protocol_version = 'HTTP/1.1'
+    app.run(host='127.0.0.1', port=args.port, threaded=True)
@@ -0,0 +1,58 @@
+"""
+Precision
+Opt-in float32 compute/storage mode for the processing services.
+Detectors deliver at most ~16 meaningful bits, so float32 halves memory and
+bandwidth. float32 runs report the deviation from the float64 path, checked
+on a few evenly spaced columns so the check stays cheap on wide tables.
+"""
+
+import base64
+
+import numpy as np
+
+DTYPES = {'float64': np.float64, 'float32': np.float32}
+
+# Columns re-run in float64 to measure the float32 deviation
+DEVIATION_COLUMNS = 8
+
+
+def resolve_dtype(params):
+    """Compute dtype requested via params['dtype'] (default float64)"""
+    name = str(params.get('dtype', 'float64')).lower()
+    if name not in DTYPES:
+        raise ValueError(f"Unknown dtype {name} (expected one of {', '.join(DTYPES)})")
+    return np.dtype(DTYPES[name])
+
+
+def wants_deviation(params, dtype):
+    """float32 runs also run the float64 path on sampled columns unless reportDeviation is false"""
+    return dtype == np.float32 and bool(params.get('reportDeviation', True))
+
+
+def deviation_columns(ncols, limit=DEVIATION_COLUMNS):
+    """Evenly spaced column indices to check against the float64 path"""
+    return np.unique(np.linspace(0, ncols - 1, min(ncols, limit)).astype(int))
+
+
+def max_abs_deviation(compact, reference):
+    if compact.size == 0:
+        return 0.0
+    return float(np.max(np.abs(compact.astype(np.float64) - reference)))
+
+
+def encode_buffer(arr, cols):
+    """Row-major binary buffer (base64) of the processed columns"""
+    arr = np.ascontiguousarray(arr)
+    return {
+        'columns': list(cols),
+        'dtype': arr.dtype.name,
+        'shape': list(arr.shape),
+        'byteOrder': 'little',
+        'buffer': base64.b64encode(arr.astype(arr.dtype.newbyteorder('<'), copy=False).tobytes()).decode('ascii'),
+    }
+
+
+def decode_buffer(obj):
+    raw = base64.b64decode(obj['buffer'])
+    dtype = np.dtype(obj['dtype']).newbyteorder('<')
+    return np.frombuffer(raw, dtype=dtype).reshape(obj['shape'])
@@ -0,0 +1,309 @@
+"""
+Request Profiling
+Captures where a slow request spends its time. A request is profiled when
+it carries an `X-Profile: 1` header (cProfile + tracemalloc peak), and any
+request that runs longer than PROFILE_SLOW_MS is captured automatically by a
+stack sampler that starts once the threshold has passed.
+
+Captures are written to profiles/<service>/ (newest MAX_PROFILES kept) and
+served by:
+
+    GET /api/profiles                  list captures, newest first
+    GET /api/profiles/<id>             metadata and top functions
+    GET /api/profiles/<id>/download    .prof (pstats / snakeviz) or .folded stacks
+"""
+
+import io
+import os
+import sys
+import json
+import time
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from collections import Counter
+from uuid import uuid4
+
+from flask import g, request, jsonify, send_file
+
+PROFILE_DIR = os.path.join(os.path.dirname(__file__), 'profiles')
+# Requests slower than this are captured automatically (0 disables)
+PROFILE_SLOW_MS = float(os.environ.get('PROFILE_SLOW_MS', 2000))
+# Stack sampling period for slow-request captures
+SAMPLE_INTERVAL = float(os.environ.get('PROFILE_SAMPLE_INTERVAL', 0.005))
+MAX_PROFILES = int(os.environ.get('PROFILE_MAX_CAPTURES', 50))
+TOP_FUNCTIONS = 25
+
+PROFILE_HEADER = 'X-Profile'
+
+# tracemalloc is process-wide, so only one full profile runs at a time;
+# concurrent header requests fall back to stack sampling
+_full_profile_lock = threading.Lock()
+
+
+class _Sampler:
+    """
+    One daemon thread per service that samples the stacks of requests running
+    longer than the slow threshold. It sleeps on an event while nothing is active.
+    """
+
+    def __init__(self):
+        self.active = {}
+        self.lock = threading.Lock()
+        self.wake = threading.Event()
+        self.thread = None
+
+    def start(self, ident, state):
+        with self.lock:
+            self.active[ident] = state
+            if self.thread is None:
+                self.thread = threading.Thread(target=self._run, name='profile-sampler', daemon=True)
+                self.thread.start()
+        self.wake.set()
+
+    def stop(self, ident):
+        with self.lock:
+            return self.active.pop(ident, None)
+
+    def _run(self):
+        while True:
+            with self.lock:
+                idle = not self.active
+                if idle:
+                    self.wake.clear()
+            if idle:
+                self.wake.wait()
+                continue
+            time.sleep(SAMPLE_INTERVAL)
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            with self.lock:
+                for ident, state in self.active.items():
+                    if now < state['sample_after']:
+                        continue
+                    frame = frames.get(ident)
+                    if frame is not None:
+                        state['samples'][_collapse(frame)] += 1
+
+
+def _collapse(frame):
+    """Stack as 'file:function;...' from the outermost frame (flamegraph folded format)"""
+    parts = []
+    while frame is not None:
+        code = frame.f_code
+        parts.append(f'{os.path.basename(code.co_filename)}:{code.co_name}')
+        frame = frame.f_back
+    return ';'.join(reversed(parts))
+
+
+def request_shape():
+    """Rows, columns, method and params of a processing request"""
+    payload = request.get_json(silent=True)
+    if not isinstance(payload, dict):
+        return {'contentLength': request.content_length, 'contentType': request.content_type}
+    table = payload.get('tableData') or payload.get('data') or payload.get('input_data') or []
+    params = payload.get('params') if isinstance(payload.get('params'), dict) else {}
+    first = table[0] if isinstance(table, list) and table and isinstance(table[0], dict) else {}
+    return {
+        'contentLength': request.content_length,
+        'rows': len(table) if isinstance(table, list) else None,
+        'columns': len(first),
+        'method': payload.get('method') or params.get('method'),
+        'params': params,
+    }
+
+
+def _top_functions(stats):
+    out = []
+    for (filename, line, func), (cc, nc, tt, ct, _) in stats.stats.items():
+        out.append({
+            'function': f'{os.path.basename(filename)}:{line}({func})',
+            'calls': nc,
+            'totalMs': round(tt * 1000, 3),
+            'cumulativeMs': round(ct * 1000, 3),
+        })
+    out.sort(key=lambda f: f['cumulativeMs'], reverse=True)
+    return out[:TOP_FUNCTIONS]
+
+
+def _top_stacks(samples):
+    total = sum(samples.values()) or 1
+    return [
+        {'stack': stack, 'samples': n, 'fraction': round(n / total, 4)}
+        for stack, n in samples.most_common(TOP_FUNCTIONS)
+    ]
+
+
+class ProfileStore:
+    def __init__(self, service, profile_dir=PROFILE_DIR):
+        self.service = service
+        self.dir = os.path.join(profile_dir, service)
+        os.makedirs(self.dir, exist_ok=True)
+
+    def _meta_path(self, capture_id):
+        return os.path.join(self.dir, f'{capture_id}.json')
+
+    def save(self, meta, profile=None, samples=None):
+        capture_id = meta['id']
+        if profile is not None:
+            profile.dump_stats(os.path.join(self.dir, f'{capture_id}.prof'))
+            meta['file'] = f'{capture_id}.prof'
+        elif samples is not None:
+            with open(os.path.join(self.dir, f'{capture_id}.folded'), 'w', encoding='utf-8') as f:
+                for stack, n in samples.most_common():
+                    f.write(f'{stack} {n}\n')
+            meta['file'] = f'{capture_id}.folded'
+        tmp = self._meta_path(capture_id) + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(meta, f)
+        os.replace(tmp, self._meta_path(capture_id))
+        self._rotate()
+
+    def _rotate(self):
+        metas = sorted(
+            (fn for fn in os.listdir(self.dir) if fn.endswith('.json')),
+            key=lambda fn: os.path.getmtime(os.path.join(self.dir, fn)),
+        )
+        for fn in metas[:max(0, len(metas) - MAX_PROFILES)]:
+            capture_id = fn[:-len('.json')]
+            for ext in ('.json', '.prof', '.folded'):
+                try:
+                    os.remove(os.path.join(self.dir, capture_id + ext))
+                except OSError:
+                    pass
+
+    def load(self, capture_id):
+        if not capture_id.replace('-', '').isalnum():
+            return None
+        try:
+            with open(self._meta_path(capture_id), 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def list(self):
+        out = []
+        for fn in os.listdir(self.dir):
+            if fn.endswith('.json'):
+                meta = self.load(fn[:-len('.json')])
+                if meta:
+                    out.append({k: v for k, v in meta.items() if k not in ('topFunctions', 'topStacks')})
+        out.sort(key=lambda m: m['timestamp'], reverse=True)
+        return out
+
+
+def install_profiler(app, service, profile_dir=PROFILE_DIR):
+    """Hook header-triggered and slow-request profiling into a Flask app"""
+    store = ProfileStore(service, profile_dir)
+    sampler = _Sampler()
+
+    def skip():
+        return request.method == 'OPTIONS' or request.path.startswith('/api/profiles')
+
+    @app.before_request
+    def _start_profile():
+        if skip():
+            return
+        g._profile_start = time.perf_counter()
+        g._profile = None
+        wanted = request.headers.get(PROFILE_HEADER, '').lower() in ('1', 'true', 'yes')
+        if wanted and _full_profile_lock.acquire(blocking=False):
+            g._profile_tracing = not tracemalloc.is_tracing()
+            if g._profile_tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+            g._profile = cProfile.Profile()
+            g._profile.enable()
+        elif wanted or PROFILE_SLOW_MS > 0:
+            # header requests that lost the race for the full profiler are sampled from the start
+            delay = 0 if wanted else PROFILE_SLOW_MS / 1000
+            g._profile_forced = wanted
+            sampler.start(threading.get_ident(), {'sample_after': g._profile_start + delay, 'samples': Counter()})
+
+    @app.after_request
+    def _finish_profile(response):
+        start = g.pop('_profile_start', None)
+        if start is None:
+            return response
+        elapsed_ms = (time.perf_counter() - start) * 1000
+        profile = g.pop('_profile', None)
+        state = sampler.stop(threading.get_ident())
+        peak = None
+        if profile is not None:
+            profile.disable()
+            _, peak = tracemalloc.get_traced_memory()
+            _release_full_profile()
+        forced = g.pop('_profile_forced', False)
+        # streamed responses (server-sent events) are still running; nothing to report
+        if response.is_streamed:
+            return response
+        if profile is None and not forced and elapsed_ms < PROFILE_SLOW_MS:
+            return response
+
+        meta = {
+            'id': str(uuid4()),
+            'service': service,
+            'timestamp': time.time(),
+            'trigger': 'header' if profile is not None or forced else 'slow',
+            'mode': 'cprofile' if profile is not None else 'sampled',
+            'method': request.method,
+            'path': request.path,
+            'status': response.status_code,
+            'elapsedMs': round(elapsed_ms, 3),
+            'tracemallocPeakBytes': peak,
+            'request': request_shape(),
+        }
+        try:
+            if profile is not None:
+                meta['topFunctions'] = _top_functions(pstats.Stats(profile, stream=io.StringIO()))
+                store.save(meta, profile=profile)
+            else:
+                samples = state['samples'] if state else Counter()
+                meta['samples'] = sum(samples.values())
+                meta['sampleIntervalMs'] = SAMPLE_INTERVAL * 1000
+                meta['topStacks'] = _top_stacks(samples)
+                store.save(meta, samples=samples)
+        except OSError as e:
+            app.logger.warning(f'Could not save profile: {e}')
+            return response
+        response.headers['X-Profile-Id'] = meta['id']
+        return response
+
+    @app.teardown_request
+    def _abort_profile(exc):
+        # after_request is skipped when a view raises; release the profiler here
+        profile = g.pop('_profile', None)
+        sampler.stop(threading.get_ident())
+        if profile is not None:
+            profile.disable()
+            _release_full_profile()
+
+    def _release_full_profile():
+        # leave tracemalloc alone if it was already tracing (PYTHONTRACEMALLOC)
+        if g.pop('_profile_tracing', False):
+            tracemalloc.stop()
+        _full_profile_lock.release()
+
+    def list_profiles():
+        return jsonify({'service': service, 'slowMs': PROFILE_SLOW_MS, 'profiles': store.list()})
+
+    def profile_info(capture_id):
+        meta = store.load(capture_id)
+        if meta is None:
+            return jsonify({'error': 'Profile not found'}), 404
+        return jsonify(meta)
+
+    def download_profile(capture_id):
+        meta = store.load(capture_id)
+        if meta is None or not meta.get('file'):
+            return jsonify({'error': 'Profile not found'}), 404
+        path = os.path.join(store.dir, meta['file'])
+        if not os.path.exists(path):
+            return jsonify({'error': 'Profile file missing'}), 410
+        return send_file(path, as_attachment=True, download_name=f"{service}-{meta['file']}")
+
+    app.add_url_rule('/api/profiles', 'list_profiles', list_profiles, methods=['GET'])
+    app.add_url_rule('/api/profiles/<capture_id>', 'profile_info', profile_info, methods=['GET'])
+    app.add_url_rule('/api/profiles/<capture_id>/download', 'download_profile', download_profile, methods=['GET'])
+    return store
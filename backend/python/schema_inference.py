@@ -0,0 +1,185 @@
+"""
+Schema Inference
+Shared numeric/x-axis/y-axis column detection for the processing services.
+Schemas are cached per fileId (or a cheap dataset fingerprint) so repeated
+requests against the same dataset skip inference entirely.
+"""
+
+import re
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Number of rows sampled (evenly spaced) when classifying columns
+SAMPLE_ROWS = 64
+# Fraction of non-empty sampled values that must parse as numbers
+NUMERIC_THRESHOLD = 0.8
+# Maximum number of cached schemas
+CACHE_SIZE = 256
+
+# Column names (normalized: lowercase, alphanumerics only) treated as the spectral x-axis
+X_AXIS_NAMES = {'x', 'shift', 'ramanshift', 'shiftxaxis', 'wavenumber', 'wavenumbers', 'wavenumbercm', 'wavelength'}
+# Name tokens that mark an x-axis column wherever they appear (e.g. "Raman Shift (cm-1)")
+X_AXIS_TOKENS = {'shift', 'wavenumber', 'wavenumbers', 'wavelength'}
+# Numeric columns that are neither x nor y (serial numbers, ids, timestamps, labels)
+INDEX_NAMES = {'sno', 'serial', 'serialno', 'index', 'idx', 'id', 'time', 'label'}
+
+_cache = OrderedDict()
+_cache_lock = threading.Lock()
+
+
+def _normalize(name):
+    return re.sub(r'[^a-z0-9]', '', str(name).lower())
+
+
+def _tokens(name):
+    return [t for t in re.split(r'[^a-z0-9]+', str(name).lower()) if t]
+
+
+def classify_column(name):
+    """Return 'x', 'index' or 'y' for a numeric column name"""
+    norm = _normalize(name)
+    tokens = _tokens(name)
+    if norm in X_AXIS_NAMES or any(t in X_AXIS_TOKENS for t in tokens):
+        return 'x'
+    if norm in INDEX_NAMES or (tokens and tokens[0] in INDEX_NAMES and len(tokens) <= 2):
+        return 'index'
+    return 'y'
+
+
+def _sample_rows(table, sample_size=SAMPLE_ROWS):
+    n = len(table)
+    if n <= sample_size:
+        return table
+    idx = np.unique(np.linspace(0, n - 1, sample_size).astype(int))
+    return [table[i] for i in idx]
+
+
+def _numeric_fraction(values):
+    # Fast path: the whole sample converts in one shot (handles '1e-3', ' 12 ', None -> nan)
+    non_empty = [v for v in values if v is not None and v != '' and not isinstance(v, bool)]
+    if not non_empty:
+        return 0.0
+    try:
+        np.asarray(non_empty, dtype=float)
+        return 1.0
+    except (TypeError, ValueError):
+        pass
+    ok = 0
+    for v in non_empty:
+        try:
+            float(v)
+            ok += 1
+        except (TypeError, ValueError):
+            continue
+    return ok / len(non_empty)
+
+
+def to_float(values):
+    """1D float array of `values`; blanks, None and unparseable cells become NaN"""
+    try:
+        return np.asarray(values, dtype=float)
+    except (TypeError, ValueError):
+        out = np.full(len(values), np.nan)
+        for i, v in enumerate(values):
+            try:
+                out[i] = float(v)
+            except (TypeError, ValueError):
+                continue
+        return out
+
+
+def table_to_array(table, cols, dtype=float):
+    """(rows, columns) array of row dicts; missing or unparseable cells become 0"""
+    arr = np.zeros((len(table), len(cols)), dtype=dtype)
+    for i, row in enumerate(table):
+        for j, col in enumerate(cols):
+            try:
+                arr[i, j] = float(row.get(col, 0) if row.get(col, None) is not None else 0)
+            except Exception:
+                arr[i, j] = 0.0
+    return arr
+
+
+def dataset_fingerprint(table, sample=None):
+    """Cheap hash over row count, column names and the sampled rows"""
+    if sample is None:
+        sample = _sample_rows(table)
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(len(table)).encode())
+    h.update(json.dumps(list(table[0].keys()) if table else [], default=str).encode())
+    h.update(json.dumps(sample, sort_keys=True, default=str).encode())
+    return h.hexdigest()
+
+
+def _infer(table, sample):
+    keys = []
+    for row in sample:
+        for k in row.keys():
+            if k not in keys:
+                keys.append(k)
+
+    numeric = [k for k in keys if _numeric_fraction([row.get(k) for row in sample]) >= NUMERIC_THRESHOLD]
+    x_cols = [c for c in numeric if classify_column(c) == 'x']
+    index_cols = [c for c in numeric if classify_column(c) == 'index']
+    y_cols = [c for c in numeric if c not in x_cols and c not in index_cols]
+    return {
+        'columns': keys,
+        'numeric': numeric,
+        'x': x_cols,
+        'y': y_cols,
+        'index': index_cols,
+        'rows': len(table),
+    }
+
+
+def infer_schema(table, file_id=None):
+    """
+    Infer (and cache) the column schema of a row-dict table.
+
+    Args:
+        table: List of dictionaries (table data)
+        file_id: Optional upload id; with the row count and column names it
+            replaces the content hash as the cache key
+
+    Returns:
+        dict with 'columns', 'numeric', 'x', 'y', 'index', 'rows'
+    """
+    if not table:
+        return {'columns': [], 'numeric': [], 'x': [], 'y': [], 'index': [], 'rows': 0}
+
+    sample = None
+    if file_id:
+        # widgets add, drop and rename columns without changing the fileId
+        keys = hashlib.blake2b(json.dumps(list(table[0].keys()), default=str).encode(), digest_size=8).hexdigest()
+        key = f'file:{file_id}:{len(table)}:{keys}'
+    else:
+        sample = _sample_rows(table)
+        key = 'hash:' + dataset_fingerprint(table, sample)
+
+    with _cache_lock:
+        schema = _cache.get(key)
+        if schema is not None:
+            _cache.move_to_end(key)
+            return schema
+
+    schema = _infer(table, sample if sample is not None else _sample_rows(table))
+    with _cache_lock:
+        _cache[key] = schema
+        while len(_cache) > CACHE_SIZE:
+            _cache.popitem(last=False)
+    return schema
+
+
+def numeric_columns(table, file_id=None):
+    """Columns the processing services operate on: y columns, or every numeric column as a fallback"""
+    schema = infer_schema(table, file_id)
+    return list(schema['y'] or schema['numeric'])
+
+
+def clear_cache():
+    with _cache_lock:
+        _cache.clear()
@@ -0,0 +1,230 @@
+"""
+Spectral Library
+Builds a memory-mapped reference matrix from a local export of the
+raman_data table and answers batched similarity queries against it.
+
+The export is read from RAMAN_LIBRARY_EXPORT (default library/raman_data.json);
+any long-format file with an x-axis, intensity and sample name column works.
+fixtures/raman_library.csv is a small multi-spectrum export, and
+test_library_search.py checks the ranking of both metrics against it:
+
+    RAMAN_LIBRARY_EXPORT=fixtures/raman_library.csv python library_search_service.py
+    python test_library_search.py
+"""
+
+import os
+import csv
+import json
+import threading
+
+import numpy as np
+
+from schema_inference import infer_schema, to_float
+
+LIBRARY_DIR = os.environ.get('RAMAN_LIBRARY_DIR', os.path.join(os.path.dirname(__file__), 'library'))
+# Local export of the raman_data table (JSON rows as returned by PostgREST, or CSV)
+EXPORT_PATH = os.environ.get('RAMAN_LIBRARY_EXPORT', os.path.join(LIBRARY_DIR, 'raman_data.json'))
+
+GRID_POINTS = 1024
+MATRIX_FILE = 'matrix.npy'
+META_FILE = 'meta.json'
+STATS_FILE = 'stats.npy'
+
+METRICS = ('cosine', 'correlation')
+
+
+def load_export_rows(path):
+    """Read exported raman_data rows from a .json or .csv file"""
+    if path.lower().endswith('.csv'):
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            return [dict(r) for r in csv.DictReader(f)]
+    with open(path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    # accept both a bare row array and the {'data': [...]} shape of /api/supabase/fetch
+    if isinstance(data, dict):
+        data = data.get('data', [])
+    return data
+
+
+def _name_column(rows, schema):
+    for c in schema['columns']:
+        if c in schema['numeric']:
+            continue
+        lower = c.lower()
+        if 'sample' in lower or 'name' in lower:
+            return c
+    non_numeric = [c for c in schema['columns'] if c not in schema['numeric']]
+    return non_numeric[0] if non_numeric else None
+
+
+def rows_to_spectra(rows):
+    """Group long-format rows (one point per row) into {name: (x, y)}"""
+    schema = infer_schema(rows)
+    if not schema['x'] or not schema['y']:
+        raise ValueError('Export must contain an x-axis (e.g. "Raman Shift") and an intensity column')
+    x_col, y_col = schema['x'][0], schema['y'][0]
+    name_col = _name_column(rows, schema)
+
+    names = np.array([str(r.get(name_col, '')) if name_col else '' for r in rows])
+    # CSV exports leave empty cells as ''; they become NaN and are dropped below
+    xs = to_float([r.get(x_col) for r in rows])
+    ys = to_float([r.get(y_col) for r in rows])
+    ok = np.isfinite(xs) & np.isfinite(ys)
+    names, xs, ys = names[ok], xs[ok], ys[ok]
+
+    uniq, inverse = np.unique(names, return_inverse=True)
+    # sort by (spectrum, x) once, then slice each spectrum out
+    order = np.lexsort((xs, inverse))
+    inverse, xs, ys = inverse[order], xs[order], ys[order]
+    bounds = np.searchsorted(inverse, np.arange(len(uniq) + 1))
+    return {str(uniq[i]): (xs[bounds[i]:bounds[i + 1]], ys[bounds[i]:bounds[i + 1]]) for i in range(len(uniq))}
+
+
+def make_grid(spectra, points=GRID_POINTS):
+    lo = min(float(x[0]) for x, _ in spectra.values())
+    hi = max(float(x[-1]) for x, _ in spectra.values())
+    return np.linspace(lo, hi, points)
+
+
+def resample(x, y, grid):
+    """Interpolate one spectrum onto the grid (zero outside its measured range)"""
+    return np.interp(grid, x, y, left=0.0, right=0.0)
+
+
+def _unit_rows(mat):
+    norms = np.linalg.norm(mat, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return mat / norms
+
+
+def build_library(export_path=EXPORT_PATH, out_dir=LIBRARY_DIR, points=GRID_POINTS):
+    """
+    Resample every reference spectrum onto a common grid and store the
+    L2-normalized float32 matrix as .npy next to its metadata.
+
+    Returns:
+        dict with 'count', 'points' and 'source'
+    """
+    spectra = rows_to_spectra(load_export_rows(export_path))
+    if not spectra:
+        raise ValueError('Export contains no spectra')
+    names = list(spectra.keys())
+    grid = make_grid(spectra, points)
+
+    os.makedirs(out_dir, exist_ok=True)
+    tmp_path = os.path.join(out_dir, MATRIX_FILE + '.tmp')
+    mat = np.lib.format.open_memmap(tmp_path, mode='w+', dtype=np.float32, shape=(len(names), len(grid)))
+    for i, name in enumerate(names):
+        x, y = spectra[name]
+        row = resample(x, y, grid)
+        norm = np.linalg.norm(row)
+        mat[i] = row / norm if norm > 0 else row
+    # per-reference mean and centered norm let correlation reuse the cosine matrix
+    means = np.asarray(mat.mean(axis=1), dtype=np.float64)
+    centered_norms = np.sqrt(np.clip(1.0 - len(grid) * means ** 2, 0.0, None))
+    mat.flush()
+    del mat
+    os.replace(tmp_path, os.path.join(out_dir, MATRIX_FILE))
+    np.save(os.path.join(out_dir, STATS_FILE), np.stack([means, centered_norms]).astype(np.float32))
+
+    meta = {
+        'names': names,
+        'grid': grid.tolist(),
+        'source': os.path.abspath(export_path),
+        'sourceMtime': os.path.getmtime(export_path),
+    }
+    with open(os.path.join(out_dir, META_FILE), 'w', encoding='utf-8') as f:
+        json.dump(meta, f)
+    return {'count': len(names), 'points': len(grid), 'source': meta['source']}
+
+
+class SpectralLibrary:
+    """Memory-mapped reference matrix plus names/grid, searched with one matrix product"""
+
+    def __init__(self, out_dir=LIBRARY_DIR):
+        with open(os.path.join(out_dir, META_FILE), 'r', encoding='utf-8') as f:
+            meta = json.load(f)
+        self.names = meta['names']
+        self.grid = np.asarray(meta['grid'], dtype=np.float64)
+        self.source = meta.get('source')
+        self.source_mtime = meta.get('sourceMtime')
+        self.matrix = np.load(os.path.join(out_dir, MATRIX_FILE), mmap_mode='r')
+        stats = np.load(os.path.join(out_dir, STATS_FILE))
+        self.means, self.centered_norms = stats[0], stats[1]
+
+    def __len__(self):
+        return len(self.names)
+
+    def prepare_queries(self, spectra):
+        """Resample (x, y) pairs onto the library grid -> float32 (n_queries, points)"""
+        q = np.empty((len(spectra), len(self.grid)), dtype=np.float32)
+        for i, (x, y) in enumerate(spectra):
+            x = np.asarray(x, dtype=float)
+            y = np.asarray(y, dtype=float)
+            if x.shape != y.shape or x.ndim != 1:
+                raise ValueError(f'Query {i}: x and y must be equal-length lists')
+            # np.interp gives NaN everywhere downstream of a single NaN
+            ok = np.isfinite(x) & np.isfinite(y)
+            x, y = x[ok], y[ok]
+            if len(x) < 2:
+                raise ValueError(f'Query {i} needs at least 2 finite (x, y) points')
+            order = np.argsort(x)
+            q[i] = resample(x[order], y[order], self.grid)
+        return q
+
+    def scores(self, queries, metric='cosine'):
+        if metric not in METRICS:
+            raise ValueError(f'Unknown metric {metric}')
+        if metric == 'correlation':
+            q = queries - queries.mean(axis=1, keepdims=True)
+            q = _unit_rows(q)
+            denom = np.where(self.centered_norms > 0, self.centered_norms, 1.0)
+            # reference rows are unit vectors; sum(q) == 0 so the reference mean drops out
+            return (q @ self.matrix.T) / denom
+        return _unit_rows(queries) @ self.matrix.T
+
+    def search(self, spectra, metric='cosine', top_k=5):
+        """
+        Score query spectra against every reference.
+
+        Returns:
+            list (one per query) of [{'name', 'score'}] sorted best first
+        """
+        queries = self.prepare_queries(spectra)
+        scores = self.scores(queries, metric)
+        k = max(1, min(int(top_k), scores.shape[1]))
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        top_scores = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-top_scores, axis=1)
+        top = np.take_along_axis(top, order, axis=1)
+        top_scores = np.take_along_axis(top_scores, order, axis=1)
+        return [
+            [{'name': self.names[j], 'score': round(float(s), 6)} for j, s in zip(top[i], top_scores[i])]
+            for i in range(len(spectra))
+        ]
+
+
+_library = None
+_library_dir = None
+_library_lock = threading.Lock()
+
+
+def get_library(export_path=EXPORT_PATH, out_dir=LIBRARY_DIR, force_rebuild=False):
+    """Load the library, rebuilding it first if the export is newer than the stored matrix"""
+    global _library, _library_dir
+    with _library_lock:
+        meta_path = os.path.join(out_dir, META_FILE)
+        stale = force_rebuild or not os.path.exists(meta_path)
+        if not stale and os.path.exists(export_path):
+            with open(meta_path, 'r', encoding='utf-8') as f:
+                built_mtime = json.load(f).get('sourceMtime') or 0
+            stale = os.path.getmtime(export_path) > built_mtime
+        if stale:
+            if not os.path.exists(export_path):
+                raise FileNotFoundError(f'Library export not found: {export_path}')
+            _library = None
+            build_library(export_path, out_dir)
+        if _library is None or _library_dir != out_dir:
+            _library = SpectralLibrary(out_dir)
+            _library_dir = out_dir
+        return _library
@@ -0,0 +1,149 @@
+"""
+Per-Spectrum Function Contract
+Custom widgets may define `process(x, y, **params) -> ndarray` instead of
+looping over input_data rows. The function is applied to every intensity
+column: first as one batched 2D call, then per column on a worker pool.
+Given the code string, the per-column fallback runs on a process pool whose
+workers re-execute the code (without input_data, output discarded), so
+pure-Python loops use every core instead of queueing on the GIL.
+"""
+
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+
+from schema_inference import infer_schema, to_float
+
+PROCESS_NAME = 'process'
+
+
+class SpectrumFunctionError(Exception):
+    """Raised when input_data or the user's process() result cannot be used"""
+
+
+def to_columns(input_data):
+    """Split row dicts into (x_name, x, [y names], Y) with Y shaped (columns, points)"""
+    schema = infer_schema(input_data)
+    y_cols = schema['y'] or [c for c in schema['numeric'] if c not in schema['x']]
+    if not y_cols:
+        raise SpectrumFunctionError('input_data has no numeric intensity columns')
+    x_name = schema['x'][0] if schema['x'] else None
+
+    def column(name):
+        return to_float([row.get(name) for row in input_data])
+
+    x = column(x_name) if x_name else np.arange(len(input_data), dtype=float)
+    Y = np.vstack([column(c) for c in y_cols])
+    return x_name, x, y_cols, Y
+
+
+def _check_shape(result, n_points, label):
+    arr = np.asarray(result, dtype=float)
+    if arr.shape != (n_points,):
+        raise SpectrumFunctionError(f'process() returned shape {arr.shape} for {label}; expected {n_points} values per spectrum')
+    return arr
+
+
+def _try_batched(process, x, Y, params):
+    """
+    Call process once with all spectra; accept only if it agrees with
+    single-spectrum calls. Returns (result or None, seconds of the batched call).
+    """
+    t0 = time.perf_counter()
+    try:
+        batched = np.asarray(process(x, Y, **params), dtype=float)
+    except Exception:
+        return None, time.perf_counter() - t0
+    elapsed = time.perf_counter() - t0
+    if batched.shape != Y.shape:
+        return None, elapsed
+    # functions written for 1D input can silently reduce over the wrong axis,
+    # so spot-check the first and last spectra against single-spectrum calls
+    for i in sorted({0, len(Y) - 1}):
+        single = np.asarray(process(x, Y[i].copy(), **params), dtype=float)
+        if single.shape != Y[i].shape or not np.allclose(single, batched[i], equal_nan=True):
+            return None, elapsed
+    return batched, elapsed
+
+
+_worker_process = None
+
+
+def _init_worker(code, make_globals):
+    """Process pool initializer: define the user's process() in this worker"""
+    global _worker_process
+    # workers share the parent's stdout, which may be a JSON channel
+    sys.stdout = sys.stderr = open(os.devnull, 'w')
+    env = make_globals()
+    env['input_data'] = None
+    env['output_data'] = None
+    exec(code, env)
+    _worker_process = env.get(PROCESS_NAME)
+
+
+def _run_column(x, y, params, label):
+    t0 = time.perf_counter()
+    if not callable(_worker_process):
+        raise SpectrumFunctionError(f'{PROCESS_NAME}() is not defined when the code runs without input_data')
+    res = _check_shape(_worker_process(x, y, **params), len(x), label)
+    return res, time.perf_counter() - t0
+
+
+def apply_spectrum_function(process, input_data, params=None, workers=None, code=None, make_globals=None):
+    """
+    Apply the user's process(x, y, **params) to every intensity column.
+
+    Args:
+        code, make_globals: The user's code and a module-level callable returning
+            fresh restricted globals; when given, the per-column fallback runs on
+            a process pool, otherwise on threads
+
+    Returns:
+        dict with 'x', 'xColumn', 'columns' ({name: values}) and 'timing'
+    """
+    params = params or {}
+    x_name, x, y_cols, Y = to_columns(input_data)
+    n_points = len(x)
+    start = time.perf_counter()
+
+    batched, call_time = _try_batched(process, x, Y, params)
+    if batched is not None:
+        out = batched
+        # one call covers every column; there is no per-column time to report
+        timing = {'mode': 'batched', 'batchedCallMs': round(call_time * 1000, 3)}
+    else:
+        workers = max(1, workers or min(len(y_cols), os.cpu_count() or 1))
+        results = None
+        if code is not None and make_globals is not None and workers > 1:
+            mode = 'per_column_processes'
+            try:
+                with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(code, make_globals)) as pool:
+                    futures = [pool.submit(_run_column, x, Y[i], params, y_cols[i]) for i in range(len(y_cols))]
+                    results = [f.result() for f in futures]
+            except BrokenProcessPool:
+                # the code's top level needs input_data (or cannot run twice); stay in this process
+                results = None
+        if results is None:
+            mode = 'per_column_threads'
+
+            def run(i):
+                t0 = time.perf_counter()
+                res = _check_shape(process(x, Y[i].copy(), **params), n_points, y_cols[i])
+                return res, time.perf_counter() - t0
+
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                results = list(pool.map(run, range(len(y_cols))))
+        out = np.vstack([r for r, _ in results])
+        timing = {'mode': mode, 'workers': workers, 'columns': {c: round(t * 1000, 3) for c, (_, t) in zip(y_cols, results)}}
+
+    timing['totalMs'] = round((time.perf_counter() - start) * 1000, 3)
+    return {
+        'xColumn': x_name,
+        'x': x.tolist(),
+        'columns': {c: np.where(np.isfinite(out[i]), out[i], None).tolist() for i, c in enumerate(y_cols)},
+        'timing': timing,
+    }
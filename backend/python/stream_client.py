@@ -0,0 +1,128 @@
+"""
+Streaming Test Client
+Replays a spectrum (CSV file or synthetic) through a streaming session in
+small chunks, then checks that the concatenated output equals one batch
+request to the noise-filter / baseline service.
+
+    python stream_client.py --local --method gaussian --sigma 2 --chunk 25
+    python stream_client.py --url http://127.0.0.1:6006 --batch-url http://127.0.0.1:6000 --csv data.csv
+"""
+
+import sys
+import csv
+import json
+import math
+import argparse
+import urllib.request
+
+# Batch endpoint equivalent to each streaming method
+BATCH_ROUTES = {
+    'moving_average': '/api/noise-filter',
+    'gaussian': '/api/noise-filter',
+    'lowpass': '/api/noise-filter',
+    'rolling_min': '/api/baseline-correction',
+}
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url.rstrip('/')
+
+    def post(self, path, body):
+        req = urllib.request.Request(self.base_url + path, data=json.dumps(body).encode(), headers={'Content-Type': 'application/json'})
+        with urllib.request.urlopen(req) as resp:
+            return json.loads(resp.read().decode())
+
+
+class LocalClient:
+    """Same interface backed by a Flask test client (no servers needed)"""
+
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def post(self, path, body):
+        resp = self.client.post(path, json=body)
+        if resp.status_code >= 400:
+            raise RuntimeError(f'{path} -> {resp.status_code}: {resp.get_json()}')
+        return resp.get_json()
+
+
+def synthetic_rows(n):
+    rows = []
+    for i in range(n):
+        shift = 400 + i * 0.5
+        peak = 1000 * math.exp(-((shift - 1000) ** 2) / 200.0)
+        rows.append({'Raman Shift': shift, 'Raman intensity': round(200 + peak + 15 * math.sin(i * 1.7), 4)})
+    return rows
+
+
+def load_rows(path):
+    with open(path, 'r', encoding='utf-8', newline='') as f:
+        return [dict(r) for r in csv.DictReader(f)]
+
+
+def run(stream_client, batch_client, rows, method, params, chunk):
+    session = stream_client.post('/api/stream/sessions', {'method': method, 'params': params})
+    sid = session['sessionId']
+    streamed = []
+    for i in range(0, len(rows), chunk):
+        streamed.extend(stream_client.post(f'/api/stream/sessions/{sid}/chunk', {'tableData': rows[i:i + chunk]})['tableData'])
+    closed = stream_client.post(f'/api/stream/sessions/{sid}/close', {})
+    streamed.extend(closed['tableData'])
+
+    batch = batch_client.post(BATCH_ROUTES[method], {'tableData': rows, 'params': {'method': method, **params}})['tableData']
+    cols = closed['columns'] or []
+    mismatches = sum(1 for a, b in zip(streamed, batch) for c in cols if a.get(c) != b.get(c))
+    return {
+        'rows': len(rows),
+        'streamed': len(streamed),
+        'chunks': math.ceil(len(rows) / chunk),
+        'columns': cols,
+        'identical': len(streamed) == len(batch) and mismatches == 0,
+        'mismatches': mismatches,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Replay a spectrum through a streaming session and compare with batch output')
+    parser.add_argument('--url', default='http://127.0.0.1:6006', help='streaming service base URL')
+    parser.add_argument('--batch-url', default=None, help='batch service base URL (noise-filter :6000, baseline :6001)')
+    parser.add_argument('--local', action='store_true', help='run the services in-process instead of over HTTP')
+    parser.add_argument('--csv', default=None, help='CSV file to replay (default: synthetic spectrum)')
+    parser.add_argument('--rows', type=int, default=2000)
+    parser.add_argument('--chunk', type=int, default=50)
+    parser.add_argument('--method', default='moving_average', choices=sorted(BATCH_ROUTES))
+    parser.add_argument('--window', type=int, default=5)
+    parser.add_argument('--sigma', type=float, default=1.0)
+    parser.add_argument('--cutoff', type=float, default=0.1)
+    parser.add_argument('--order', type=int, default=2)
+    args = parser.parse_args(argv)
+
+    params = {
+        'moving_average': {'window': args.window},
+        'gaussian': {'sigma': args.sigma},
+        'rolling_min': {'window': args.window},
+        'lowpass': {'cutoff': args.cutoff, 'order': args.order},
+    }[args.method]
+    rows = load_rows(args.csv) if args.csv else synthetic_rows(args.rows)
+
+    if args.local:
+        import streaming_service
+        stream_client = LocalClient(streaming_service.app)
+        if BATCH_ROUTES[args.method] == '/api/baseline-correction':
+            import baseline_correction_service as batch_service
+        else:
+            import noise_filter_service as batch_service
+        batch_client = LocalClient(batch_service.app)
+    else:
+        default_port = 6001 if BATCH_ROUTES[args.method] == '/api/baseline-correction' else 6000
+        stream_client = HttpClient(args.url)
+        batch_client = HttpClient(args.batch_url or f'http://127.0.0.1:{default_port}')
+
+    report = run(stream_client, batch_client, rows, args.method, params, args.chunk)
+    print(json.dumps(report, indent=2))
+    return 0 if report['identical'] else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
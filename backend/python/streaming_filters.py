@@ -0,0 +1,175 @@
+"""
+Streaming Filters
+Stateful per-session filters for continuous acquisition. Each chunk is
+processed in O(chunk) and the concatenation of everything emitted (including
+the final flush) equals batch-processing the concatenated stream.
+
+Centered filters need `right` samples of look-ahead, so their output lags the
+input by that many samples until the session is flushed.
+"""
+
+from collections import deque
+
+import numpy as np
+from scipy.ndimage import gaussian_filter1d
+from scipy.signal import butter, lfilter, lfilter_zi
+
+
+class WindowFilter:
+    """
+    Centered window filter with edge ('nearest') padding, matching the batch
+    services: output[i] depends on input[i - left .. i + right].
+    """
+
+    def __init__(self, ncols, left, right):
+        self.ncols = ncols
+        self.left = left
+        self.right = right
+        self.tail = None
+
+    def _compute(self, buf):
+        """Outputs for every position of buf that has full left/right context"""
+        raise NotImplementedError
+
+    def push(self, chunk):
+        if len(chunk) == 0:
+            return np.empty((0, self.ncols))
+        if self.tail is None:
+            self.tail = np.repeat(chunk[:1], self.left, axis=0)
+        buf = np.concatenate([self.tail, chunk])
+        keep = self.left + self.right
+        out = self._compute(buf) if len(buf) > keep else np.empty((0, self.ncols))
+        self.tail = buf[max(0, len(buf) - keep):] if keep else buf[:0]
+        return out
+
+    def flush(self):
+        tail, self.tail = self.tail, None
+        if tail is None or self.right == 0:
+            return np.empty((0, self.ncols))
+        return self._compute(np.concatenate([tail, np.repeat(tail[-1:], self.right, axis=0)]))
+
+
+class MovingAverage(WindowFilter):
+    def __init__(self, ncols, window=3):
+        window = int(window)
+        if window < 1:
+            window = 3
+        super().__init__(ncols, window // 2, window - 1 - window // 2)
+        self.kernel = np.ones(window) / float(window)
+
+    def _compute(self, buf):
+        out = np.empty((len(buf) - self.left - self.right, self.ncols))
+        for c in range(self.ncols):
+            out[:, c] = np.convolve(buf[:, c], self.kernel, mode='valid')
+        return out
+
+
+class Gaussian(WindowFilter):
+    def __init__(self, ncols, sigma=1.0, truncate=4.0):
+        self.sigma = float(sigma)
+        self.truncate = truncate
+        radius = int(truncate * self.sigma + 0.5)
+        super().__init__(ncols, radius, radius)
+
+    def _compute(self, buf):
+        # interior samples of a padded buffer do not depend on the boundary mode
+        full = gaussian_filter1d(buf, sigma=self.sigma, axis=0, mode='nearest', truncate=self.truncate)
+        return full[self.left:len(buf) - self.right]
+
+
+class RollingMinSubtract:
+    """
+    Baseline rolling_min: value minus the centered window minimum. One
+    monotonic deque per column keeps the running minimum in O(1) amortized.
+    """
+
+    def __init__(self, ncols, window=5):
+        window = int(window)
+        if window < 1:
+            window = 5
+        self.ncols = ncols
+        self.window = window
+        self.left = window // 2
+        self.right = window - 1 - self.left
+        self.deques = [deque() for _ in range(ncols)]
+        # last right+1 padded samples; recent[0] is the center of the window just completed
+        self.recent = deque(maxlen=self.right + 1)
+        self.pos = 0
+        self.last = None
+
+    def _feed(self, values):
+        out = []
+        for row in values:
+            p = self.pos
+            self.recent.append(row)
+            mins = np.empty(self.ncols)
+            for c in range(self.ncols):
+                dq = self.deques[c]
+                v = row[c]
+                while dq and dq[-1][1] >= v:
+                    dq.pop()
+                dq.append((p, v))
+                while dq[0][0] <= p - self.window:
+                    dq.popleft()
+                mins[c] = dq[0][1]
+            if p >= self.window - 1:
+                out.append(self.recent[0] - mins)
+            self.pos += 1
+        return np.array(out).reshape(len(out), self.ncols)
+
+    def push(self, chunk):
+        if len(chunk) == 0:
+            return np.empty((0, self.ncols))
+        if self.last is None:
+            self._feed(np.repeat(chunk[:1], self.left, axis=0))
+        self.last = chunk[-1:]
+        return self._feed(chunk)
+
+    def flush(self):
+        if self.last is None:
+            return np.empty((0, self.ncols))
+        out = self._feed(np.repeat(self.last, self.right, axis=0))
+        self.last = None
+        return out
+
+
+class LowPass:
+    """Causal Butterworth low-pass; lfilter state (zi) carries across chunks"""
+
+    def __init__(self, ncols, cutoff=0.1, order=2):
+        self.ncols = ncols
+        self.b, self.a = butter(int(order), float(cutoff))
+        self.zi = None
+
+    def push(self, chunk):
+        if len(chunk) == 0:
+            return np.empty((0, self.ncols))
+        if self.zi is None:
+            self.zi = lfilter_zi(self.b, self.a)[:, None] * chunk[:1]
+        out, self.zi = lfilter(self.b, self.a, chunk, axis=0, zi=self.zi)
+        return out
+
+    def flush(self):
+        return np.empty((0, self.ncols))
+
+
+def lowpass_batch(arr, cutoff=0.1, order=2):
+    """Batch equivalent of LowPass (steady-state start at the first sample)"""
+    b, a = butter(int(order), float(cutoff))
+    zi = lfilter_zi(b, a)[:, None] * arr[:1]
+    out, _ = lfilter(b, a, arr, axis=0, zi=zi)
+    return out
+
+
+STREAM_METHODS = {
+    'moving_average': lambda ncols, p: MovingAverage(ncols, p.get('window', 3)),
+    'gaussian': lambda ncols, p: Gaussian(ncols, p.get('sigma', 1.0)),
+    'rolling_min': lambda ncols, p: RollingMinSubtract(ncols, p.get('window', 5)),
+    'lowpass': lambda ncols, p: LowPass(ncols, p.get('cutoff', 0.1), p.get('order', 2)),
+}
+
+
+def make_stream_filter(method, ncols, params):
+    if method not in STREAM_METHODS:
+        raise ValueError(f'Unknown method {method}')
+    return STREAM_METHODS[method](ncols, params)
@@ -0,0 +1,205 @@
+"""
+Streaming Service
+Session-based ingestion for continuous instrument acquisition. A session keeps
+the filter state between chunks, so each update is processed in O(chunk)
+instead of resending the whole history to /api/noise-filter.
+
+    POST /api/stream/sessions                 {method, params, columns?} -> sessionId
+    POST /api/stream/sessions/<id>/chunk      {tableData: [rows]}        -> processed rows
+    GET  /api/stream/sessions/<id>/events     server-sent events with every processed chunk
+    POST /api/stream/sessions/<id>/close      flush the remaining (look-ahead) rows
+"""
+
+from flask import Flask, request, jsonify, Response
+import json
+import time
+import queue
+import threading
+from collections import deque
+from uuid import uuid4
+
+from schema_inference import numeric_columns, table_to_array
+from streaming_filters import STREAM_METHODS, make_stream_filter
+from profiling import install_profiler
+
+app = Flask(__name__)
+install_profiler(app, 'streaming')
+
+# Idle sessions are dropped after this many seconds
+SESSION_TTL = 600
+MAX_SESSIONS = 64
+
+_sessions = {}
+_sessions_lock = threading.Lock()
+
+
+class StreamSession:
+    def __init__(self, method, params, columns=None):
+        self.id = str(uuid4())
+        self.method = method
+        self.params = params
+        self.columns = list(columns) if columns else None
+        self.filter = None
+        # rows received but not yet emitted (centered filters lag by their look-ahead)
+        self.pending = deque()
+        self.received = 0
+        self.emitted = 0
+        self.closed = False
+        self.last_active = time.time()
+        self.lock = threading.Lock()
+        self.subscribers = []
+
+    def _emit(self, values):
+        out = []
+        for vals in values:
+            row = dict(self.pending.popleft())
+            for j, col in enumerate(self.columns):
+                if isinstance(row.get(col, None), int):
+                    row[col] = int(round(vals[j]))
+                else:
+                    row[col] = round(float(vals[j]), 6)
+            out.append(row)
+        self.emitted += len(out)
+        event = {'sessionId': self.id, 'rows': out, 'emitted': self.emitted, 'closed': self.closed}
+        for q in list(self.subscribers):
+            q.put(event)
+        return out
+
+    def push(self, rows):
+        with self.lock:
+            if self.closed:
+                raise ValueError('Session is closed')
+            self.last_active = time.time()
+            if not rows:
+                return []
+            if self.columns is None:
+                self.columns = numeric_columns(rows)
+                if not self.columns:
+                    raise ValueError('No numeric columns found')
+            if self.filter is None:
+                self.filter = make_stream_filter(self.method, len(self.columns), self.params)
+            self.pending.extend(rows)
+            self.received += len(rows)
+            return self._emit(self.filter.push(table_to_array(rows, self.columns)))
+
+    def close(self):
+        with self.lock:
+            if self.closed:
+                return []
+            self.closed = True
+            out = self._emit(self.filter.flush()) if self.filter is not None else []
+            if not out:
+                for q in list(self.subscribers):
+                    q.put({'sessionId': self.id, 'rows': [], 'emitted': self.emitted, 'closed': True})
+            return out
+
+    def info(self):
+        return {
+            'sessionId': self.id,
+            'method': self.method,
+            'params': self.params,
+            'columns': self.columns,
+            'received': self.received,
+            'emitted': self.emitted,
+            'pending': len(self.pending),
+            'closed': self.closed,
+        }
+
+
+def _prune_sessions():
+    cutoff = time.time() - SESSION_TTL
+    with _sessions_lock:
+        for sid in [sid for sid, s in _sessions.items() if s.last_active < cutoff and not s.subscribers]:
+            del _sessions[sid]
+
+
+def _get_session(session_id):
+    with _sessions_lock:
+        return _sessions.get(session_id)
+
+
+@app.route('/api/stream/sessions', methods=['POST'])
+def create_session():
+    payload = request.get_json() or {}
+    params = payload.get('params', {})
+    method = payload.get('method') or params.get('method', 'moving_average')
+    if method not in STREAM_METHODS:
+        return jsonify({'error': f'Unknown method {method}', 'methods': list(STREAM_METHODS)}), 400
+
+    _prune_sessions()
+    session = StreamSession(method, params, payload.get('columns'))
+    with _sessions_lock:
+        if len(_sessions) >= MAX_SESSIONS:
+            return jsonify({'error': 'Too many open stream sessions'}), 429
+        _sessions[session.id] = session
+    return jsonify(session.info()), 201
+
+
+@app.route('/api/stream/sessions/<session_id>', methods=['GET'])
+def session_info(session_id):
+    session = _get_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    return jsonify(session.info())
+
+
+@app.route('/api/stream/sessions/<session_id>/chunk', methods=['POST'])
+def push_chunk(session_id):
+    session = _get_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    payload = request.get_json() or {}
+    rows = payload.get('tableData') or payload.get('data') or []
+    if not isinstance(rows, list):
+        return jsonify({'error': 'tableData must be a list of rows (objects)'}), 400
+    try:
+        out = session.push(rows)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'tableData': out, **session.info()})
+
+
+@app.route('/api/stream/sessions/<session_id>/close', methods=['POST'])
+def close_session(session_id):
+    session = _get_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    out = session.close()
+    with _sessions_lock:
+        if not session.subscribers:
+            _sessions.pop(session_id, None)
+    return jsonify({'tableData': out, **session.info()})
+
+
+@app.route('/api/stream/sessions/<session_id>/events', methods=['GET'])
+def session_events(session_id):
+    session = _get_session(session_id)
+    if session is None:
+        return jsonify({'error': 'Session not found'}), 404
+    q = queue.Queue()
+    session.subscribers.append(q)
+
+    def stream():
+        try:
+            yield f'event: open\ndata: {json.dumps(session.info())}\n\n'
+            while True:
+                try:
+                    event = q.get(timeout=15)
+                except queue.Empty:
+                    # keep-alive comment so proxies do not drop the connection
+                    yield ': keep-alive\n\n'
+                    continue
+                yield f'data: {json.dumps(event)}\n\n'
+                if event.get('closed'):
+                    break
+        finally:
+            session.subscribers.remove(q)
+            if session.closed:
+                with _sessions_lock:
+                    _sessions.pop(session_id, None)
+
+    return Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+if __name__ == '__main__':
+    app.run(host='127.0.0.1', port=6006, threaded=True)
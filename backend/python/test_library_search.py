@@ -0,0 +1,86 @@
+"""
+Library Search Check
+Builds the spectral library from fixtures/raman_library.csv (five long-format
+reference spectra, one blank cell) in a temporary directory and checks the
+/api/library-search ranking for both metrics. Needs no running services.
+
+    python test_library_search.py
+"""
+
+import os
+import sys
+import math
+import tempfile
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+os.environ['RAMAN_LIBRARY_EXPORT'] = os.path.join(HERE, 'fixtures', 'raman_library.csv')
+os.environ['RAMAN_LIBRARY_DIR'] = tempfile.mkdtemp(prefix='raman-library-')
+
+from library_search_service import app  # noqa: E402  (reads the environment above)
+
+CALCITE = [(280, 10, 300), (712, 8, 200), (1086, 7, 1000)]
+POLYSTYRENE = [(620, 12, 300), (1000, 8, 1000), (1030, 8, 400), (1600, 10, 500)]
+
+
+def spectrum(peaks, offset=0.0, start=100, stop=1801, step=5):
+    x = list(range(start, stop, step))
+    y = [20 + offset + sum(h * math.exp(-((s - c) / w) ** 2) for c, w, h in peaks) for s in x]
+    return x, y
+
+
+def search(client, spectra, metric, top_k=3):
+    resp = client.post('/api/library-search', json={'spectra': spectra, 'params': {'metric': metric, 'topK': top_k}})
+    return resp.status_code, resp.get_json()
+
+
+def main():
+    client = app.test_client()
+    failures = []
+
+    def check(label, ok):
+        print(f"{'ok  ' if ok else 'FAIL'} {label}")
+        if not ok:
+            failures.append(label)
+
+    info = client.get('/api/library-search/info').get_json()
+    check('library built from the fixture (blank cell tolerated)', info.get('count') == 5)
+
+    # a fluorescent calcite sample: the calcite peaks on a large flat offset, sampled on a finer grid
+    x, y = spectrum(CALCITE, offset=800.0)
+    # a polystyrene sample with a missing reading
+    px, py = spectrum(POLYSTYRENE)
+    py[40] = None
+    queries = [{'name': 'fluorescent', 'x': x, 'y': y}, {'name': 'polystyrene', 'x': px, 'y': py}]
+
+    status, body = search(client, queries, 'cosine')
+    check('cosine: 200', status == 200)
+    if status == 200:
+        fluo, poly = (r['matches'] for r in body['results'])
+        # cosine sees the offset, so the fluorescent reference wins outright
+        check('cosine: fluorescent query -> Calcite (fluorescent) first', fluo[0]['name'] == 'Calcite (fluorescent)')
+        check('cosine: plain Calcite second', fluo[1]['name'] == 'Calcite' and fluo[1]['score'] < fluo[0]['score'] - 0.05)
+        check('cosine: polystyrene query -> Polystyrene first', poly[0]['name'] == 'Polystyrene')
+        check('cosine: scores sorted best first', all(a['score'] >= b['score'] for a, b in zip(poly, poly[1:])))
+
+    status, body = search(client, queries, 'correlation')
+    check('correlation: 200', status == 200)
+    if status == 200:
+        fluo, poly = (r['matches'] for r in body['results'])
+        # correlation removes the offset: both calcite references match equally well
+        check('correlation: both calcite references on top', {m['name'] for m in fluo[:2]} == {'Calcite', 'Calcite (fluorescent)'})
+        # not 1.0: the references are sampled every 10 cm-1, coarser than the narrow calcite peaks
+        check('correlation: calcite scores equal and high', abs(fluo[0]['score'] - fluo[1]['score']) < 1e-3
+              and fluo[1]['score'] > 0.95 and fluo[2]['score'] < 0.5)
+        check('correlation: polystyrene query -> Polystyrene first', poly[0]['name'] == 'Polystyrene')
+
+    status, _ = search(client, [{'x': [500, 600], 'y': [1.0, None]}], 'cosine')
+    check('query with fewer than 2 finite points -> 400', status == 400)
+    status, _ = search(client, queries, 'cosine', top_k='five')
+    check('non-integer topK -> 400', status == 400)
+
+    print(f'\n{len(failures)} failed' if failures else '\nall checks passed')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -13,7 +13,7 @@ const supabase = createClient(supabaseUrl, supabaseKey);
 /**
  * Execute custom Python code directly via child_process
  */
-function executeCodeDirect(code, input_data) {
+function executeCodeDirect(code, input_data, params = {}) {
   return new Promise((resolve, reject) => {
     const pythonScript = path.join(__dirname, '..', 'python', 'execute_code_inline.py');
     const pythonProcess = spawn('python', [pythonScript], {
@@ -73,7 +73,8 @@ function executeCodeDirect(code, input_data) {
     // Send input as JSON to Python stdin with cleaned data
     const input = JSON.stringify({ 
       code: cleanData(code), 
-      input_data: cleanData(input_data) 
+      input_data: cleanData(input_data),
+      params: cleanData(params)
     });
     pythonProcess.stdin.write(input, 'utf-8');
     pythonProcess.stdin.end();
@@ -86,7 +87,7 @@ function executeCodeDirect(code, input_data) {
  */
 router.post('/execute', async (req, res) => {
   try {
-    const { code, input_data } = req.body;
+    const { code, input_data, params } = req.body;
     console.log(`[Custom Code] Received execute request, code length: ${code?.length || 0}, input rows: ${input_data?.length || 0}`);
 
     if (!code) {
@@ -96,7 +97,7 @@ router.post('/execute', async (req, res) => {
     // Try direct execution first (fallback if Flask service unavailable)
     try {
       console.log('[Custom Code] Attempting direct Python execution...');
-      const result = await executeCodeDirect(code, input_data || []);
+      const result = await executeCodeDirect(code, input_data || [], params || {});
       console.log('[Custom Code] Direct execution successful');
       return res.json(result);
     } catch (directError) {
@@ -108,7 +109,8 @@ router.post('/execute', async (req, res) => {
         console.log('[Custom Code] Attempting Flask service fallback...');
         const response = await axios.post('http://127.0.0.1:6004/api/custom-code/execute', {
           code,
-          input_data: input_data || []
+          input_data: input_data || [],
+          params: params || {}
         }, {
           timeout: 30000
         });